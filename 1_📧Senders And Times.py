@@ -1,17 +1,18 @@
-import ast
 import pandas as pd
 import streamlit as st
 from matplotlib import pyplot as plt
 import seaborn as sns
 
+from enron import cube, data_access, profiling, recipients
 
-def time_dist(col_to_plot):
+
+def time_dist():
     """
        Generate a bar chart showing the distribution of email sending times during the day.
     """
 
     # Create a new DataFrame for visualization
-    time_df = filter_df.groupby(filter_df['Hour']).size().reset_index(name='count')
+    time_df = count_by('Hour', filters)
     time_df.columns = ['hour', 'count']
     # Assign colors based on rank
     ranks = time_df['count'].rank(method='min', ascending=False)
@@ -23,15 +24,15 @@ def time_dist(col_to_plot):
     ax.set_xlabel('Hour of the day', fontweight='bold', fontsize=12)
     ax.set_ylabel('Number of emails', fontweight='bold', fontsize=12)
     ax.set_title('Distribution of Email Sending Times')
-    col_to_plot.pyplot(fig)
+    return fig
 
 
-def emails_senders(col_to_plot):
+def emails_senders():
     """
     Create a bar chart displaying the top 15 email senders and the number of emails they have sent.
     """
 
-    grouped_df = filter_df.groupby('From').size().reset_index(name='Emails_Sent')
+    grouped_df = count_by('From', filters).rename(columns={'count': 'Emails_Sent'})
     grouped_df = grouped_df.sort_values('Emails_Sent', ascending=False)
 
     fig, ax = plt.subplots(figsize=(10, 9))
@@ -42,15 +43,15 @@ def emails_senders(col_to_plot):
     ax.set_title('Most Emails Per User (Top 20 Senders)', fontsize=20)
     ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
     plt.tight_layout()
-    col_to_plot.pyplot(fig)
+    return fig
 
 
-def outsource_senders(col_to_plot):
+def outsource_senders():
     """
     Generate a bar chart illustrating the top 20 outsource email senders and the number of emails they have sent.
     """
 
-    grouped_df = filter_df.groupby('From').size().reset_index(name='Emails_Sent')
+    grouped_df = count_by('From', filters).rename(columns={'count': 'Emails_Sent'})
     outsources = grouped_df[~grouped_df['From'].str.contains('enron', case=False)]
     outsources = outsources.sort_values('Emails_Sent', ascending=False)
 
@@ -63,15 +64,15 @@ def outsource_senders(col_to_plot):
     ax.set_title('Biggest Outsource Senders (Top 20)', fontsize=20)
     ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
     plt.tight_layout()
-    col_to_plot.pyplot(fig)
+    return fig
 
 
-def day_dist(col_to_plot):
+def day_dist():
     """
     Generate a pie chart showcasing the distribution of email sending days.
     """
 
-    day_df = filter_df.groupby(filter_df['Day']).size().reset_index(name='count')
+    day_df = count_by('Day', filters)
 
     # Combine Friday and Saturday into a single slice
     weekend_count = day_df.loc[day_df['Day'].isin(['Saturday', 'Sunday']), 'count'].sum()
@@ -91,32 +92,46 @@ def day_dist(col_to_plot):
     ax.pie(day_df['count'], labels=day_df['Day'], autopct='%1.1f%%', colors=sns.color_palette('Set2'),
            explode=explode, textprops={'fontsize': 12})
     ax.set_title('Distribution of Email Sending Days', fontsize=12)
-    col_to_plot.pyplot(fig)
+    return fig
 
 
-def biggest_repliers(col_to_plot):
+def biggest_repliers():
     """
-    Generate a bar chart showing the top 15 email repliers and the number of emails they have sent.
+    Generate a bar chart showing the top 15 email repliers and the number of replies they have sent.
+
+    Replies come from the conversation threading done at ingest: a message only counts as a reply when it answers a
+    message sent to its sender in the same conversation, whatever its subject says.
     """
 
-    grouped_df = filter_df.groupby('Is-Reply').size().reset_index(name='Reply_Count')
-    grouped_df = grouped_df.sort_values('Reply_Count', ascending=False)
+    data_access.require('thread senders', generation=generation)
+    repliers_df = data_access.get_thread_senders(generation).nlargest(15, 'Replies_Sent')
 
     fig, ax = plt.subplots(figsize=(10, 9))
-    sns.barplot(data=grouped_df.head(15), x='From', y='Emails_Sent', palette=sns.color_palette("crest", 15), ax=ax)
+    sns.barplot(data=repliers_df, x='From', y='Replies_Sent', palette=sns.color_palette("crest", len(repliers_df)),
+                ax=ax)
     ax.set_xlabel('Replier Email', fontweight='bold', fontsize=18)
-    ax.set_ylabel('Number of Emails Sent', fontweight='bold', fontsize=18)
+    ax.set_ylabel('Number of Replies Sent', fontweight='bold', fontsize=18)
     ax.set_title('Biggest Email Repliers (Top 15 Senders)', fontsize=20)
     ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
     plt.tight_layout()
-    col_to_plot.pyplot(fig)
-
-
-def find_connected_users(col_to_plot):
-    filter_df['To'] = filter_df['To'].apply(ast.literal_eval)
-    explode_df = filter_df.explode('To', ignore_index=True)
-    helper_df = explode_df.groupby('To').size().reset_index(name='count')
-    helper_df = helper_df.sort_values('count', ascending=False)
+    return fig
+
+
+def find_connected_users():
+    data_access.require('dataset', 'recipients', generation=generation)
+    # Only the partitions of the selected year and month are loaded
+    with perf.stage('load emails') as stage:
+        emails_df = data_access.get_emails(['Message-ID', 'From', 'Year', 'Month', 'Day', 'Is-Reply', 'Is-Forwarded'],
+                                           years=[filters['Year']] if 'Year' in filters else None,
+                                           months=[filters['Month']] if 'Month' in filters else None,
+                                           generation=generation)
+        stage['rows'] = len(emails_df)
+    with perf.stage('filter masks') as stage:
+        filter_df = cube.apply_filters(emails_df, filters)
+        stage['rows'] = len(filter_df)
+    with perf.stage('recipient counts') as stage:
+        helper_df = recipients.recipient_counts(data_access.get_recipients(generation), filter_df['Message-ID'])
+        stage['rows'] = len(helper_df)
     fig, ax = plt.subplots(figsize=(10, 9))
     num_to_show = min(15, helper_df.shape[0])
     sns.barplot(data=helper_df.head(num_to_show), x='To', y='count', palette=sns.color_palette("flare", num_to_show),
@@ -126,18 +141,46 @@ def find_connected_users(col_to_plot):
     ax.set_title('Most Sent Emails To', fontsize=20)
     ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
     plt.tight_layout()
-    col_to_plot.pyplot(fig)
+    return fig
 
 
-st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+def count_by(column, filters):
+    """
+    Number of emails per value of ``column`` among the emails matching ``filters``, from the query backend when it
+    is enabled and from the count cube otherwise.
+    """
+
+    with perf.stage(f'count by {column}') as stage:
+        if database is not None:
+            counts = database.count_by(column, filters)
+        else:
+            counts = cube.counts_by(cube.apply_filters(cube_df, filters), column)
+        stage['rows'] = len(counts)
+    return counts
 
 
-@st.cache_data
-def get_data():
-    return pd.read_csv('modified_emails.csv')
+def show_figure(col_to_plot, draw):
+    """
+    Show a chart from the figure cache, drawing it only the first time these filters are seen for this data version.
+    """
+
+    with perf.stage(f'chart {draw.__name__}'):
+        png = figures.render(draw.__name__, sorted(filters.items()), data_version, draw)
+        col_to_plot.image(png, use_column_width=True)
 
 
-df = get_data()
+st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+perf = profiling.start_page("senders_and_times")
+# Every artifact of this run comes from the same data version, even if a new one is swapped in meanwhile
+generation = data_access.get_generation()
+
+with perf.stage('load data'):
+    database = data_access.get_database(generation)
+    if database is None:
+        data_access.require('cube', generation=generation)
+    cube_df = data_access.get_cube(generation) if database is None else None
+    figures = data_access.get_figure_cache()
+    data_version = data_access.get_data_version(generation)
 # Some data filtering...
 st.sidebar.header("Filter Here:")
 reply_options = ["All", True, False]
@@ -152,42 +195,35 @@ month_dict = {"January": 1, "February": 2, "March": 3, "April": 4, "May": 5, "Ju
 
 day_dict = {"Sunday": 1, "Monday": 2, "Tuesday": 3, "Wednesday": 4, "Thursday": 5, "Friday": 6, "Saturday": 7}
 
-months = df["Month"].unique()
+years = [int(year) for year in count_by("Year", {})["Year"]]
+
+months = count_by("Month", {})["Month"]
 months_sorted = sorted(months, key=lambda x: month_dict.get(x))
 
-days = df["Day"].unique()
+days = count_by("Day", {})["Day"]
 days_sorted = sorted(days, key=lambda x: day_dict.get(x))
 
+selected_year = st.sidebar.selectbox("Select Year:", ["All"] + years)
 selected_month = st.sidebar.selectbox("Select Month:", ["All"] + list(months_sorted))
 selected_day = st.sidebar.selectbox("Select Day:", ["All"] + list(days_sorted))
 
-senders = df['From'].value_counts().nlargest(10).index.tolist()
+senders = count_by('From', {}).nlargest(10, 'count')['From'].tolist()
 selected_sender = st.sidebar.selectbox("Select Sender Mail:", ["All"] + senders)
 
-filter_df = df
-if selected_sender != "All":
-    filter_df = filter_df[filter_df["From"] == selected_sender]
-
-if selected_month != "All":
-    filter_df = filter_df[filter_df["Month"] == selected_month]
-
-if selected_day != "All":
-    filter_df = filter_df[filter_df["Day"] == selected_day]
-
-if is_reply != "All":
-    filter_df = filter_df[filter_df["Is-Reply"] == is_reply]
-
-if is_forward != "All":
-    filter_df = filter_df[filter_df["Is-Forwarded"] == is_forward]
+# The filters are answered by aggregations, only the recipient chart needs the messages themselves
+filters = {"From": selected_sender, "Year": selected_year, "Month": selected_month, "Day": selected_day,
+           "Is-Reply": is_reply, "Is-Forwarded": is_forward}
+filters = {column: value for column, value in filters.items() if value != "All"}
 
 # Adding Some KPI's
 st.title(":bar_chart: Emails Data")
 st.markdown("##")
-total_emails = filter_df.shape[0]
+sender_counts = count_by('From', filters).set_index('From')['count']
+total_emails = sender_counts.sum()
 if total_emails != 0:
-    total_senders = filter_df['From'].nunique()
-    most_emails = filter_df['From'].value_counts().idxmax()
-    emails_amount = filter_df['From'].value_counts().max()
+    total_senders = sender_counts.shape[0]
+    most_emails = sender_counts.idxmax()
+    emails_amount = sender_counts.max()
 
     l_col, m_col, r_col = st.columns(3)
     # Will have 3 KPIs - Total Emails, Total Distinct Senders, Most Prolific Emailer
@@ -204,13 +240,18 @@ if total_emails != 0:
     st.markdown("---")
     # Plotting
     l_col, r_col = st.columns(2)
-    time_dist(l_col)
+    show_figure(l_col, time_dist)
     if selected_day == "All":
-        day_dist(l_col)
+        show_figure(l_col, day_dist)
+    # Reply statistics are precomputed over all messages, so they are only shown unfiltered
+    if not filters:
+        show_figure(l_col, biggest_repliers)
     if selected_sender == "All":
-        emails_senders(r_col)
-        outsource_senders(r_col)
+        show_figure(r_col, emails_senders)
+        show_figure(r_col, outsource_senders)
     else:
-        find_connected_users(r_col)
+        show_figure(r_col, find_connected_users)
 else:
     st.warning("Data Set Is Empty After Filtering")
+
+perf.show()
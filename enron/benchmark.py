@@ -0,0 +1,162 @@
+"""
+Benchmarks of the ingest stages, data loading, the Senders page aggregations, text cleaning, the graph analytics and
+conversation threading on synthetic Enron-shaped data sets.
+
+Every stage reports its wall time and, unless ``--no-memory`` is given, the peak of Python allocations traced with
+``tracemalloc`` while it ran (allocations of worker processes and of Arrow's own memory pool are not included, and
+tracing slows the stages down). Results are written as JSON, stamped with the current git commit, so runs can be
+compared across commits.
+
+Usage: python -m enron.benchmark --scales 10000 100000 500000 [--workdir benchmark] [--output benchmark/benchmark.json]
+"""
+import argparse
+import email
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from enron import (cube, data_access, dates, graph_analytics, graph_store, ingest, recipients, storage, synthetic,
+                   text_cleaning, threads)
+
+DATE_RE = r'(?m)^Date:[ \t]*(.*?)[ \t]*$'
+DATASET_COLUMNS = ['Message-ID', 'From', 'Year', 'Month', 'Day', 'Is-Reply', 'Is-Forwarded']
+SENDERS_COLUMNS = ['Hour', 'From', 'Day', 'Month', 'Year']
+
+
+class Benchmark:
+    """
+    Runs stages one after the other and collects their timings.
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.results = []
+
+    def measure(self, stage, fn, rows=None):
+        """
+        Run ``fn``, record its time (and peak traced memory) under ``stage`` and return its result.
+        """
+
+        gc.collect()
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        record = {'stage': stage, 'seconds': seconds}
+        if self.memory:
+            record['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if rows is not None:
+            record['rows'] = rows
+            record['rows_per_second'] = rows / seconds if seconds else None
+        self.results.append(record)
+        memory = f", {record['peak_memory_bytes'] / 2 ** 20:.1f} MiB peak" if self.memory else ''
+        print(f"  {stage}: {seconds:.3f}s{memory}")
+        return result
+
+
+def run_scale(n_messages, workdir, workers=None, memory=True, cleaning_sample=20000):
+    """
+    Benchmark every stage on a synthetic data set of ``n_messages`` messages, generated into ``workdir`` on first
+    use, and return the stage results.
+    """
+
+    os.makedirs(workdir, exist_ok=True)
+    source = os.path.join(workdir, f'emails-{n_messages}.csv')
+    data_dir = os.path.join(workdir, f'data-{n_messages}')
+    if not os.path.exists(source):
+        synthetic.write_csv(source, n_messages)
+    bench = Benchmark(memory)
+    raw = pd.read_csv(source)['message']
+
+    # Ingest stages
+    messages = bench.measure('parse_messages', lambda: list(map(email.message_from_string, raw)), len(raw))
+    bench.measure('get_text_from_email', lambda: list(map(ingest.get_text_from_email, messages)), len(messages))
+    del messages
+    headers = raw.str.extract(DATE_RE, expand=False).dropna()
+    bench.measure('parse_custom_date', lambda: [dates.parse_custom_date(header) for header in headers], len(headers))
+    bench.measure('parse_dates', lambda: dates.parse_dates(headers), len(headers))
+    del raw, headers
+    chunks = ingest.iter_parsed_chunks(source, workers=workers)
+    rows = bench.measure('ingest', lambda: ingest.write_parquet(chunks, data_dir, workers=workers), n_messages)
+
+    # Data set loads, the first read of the columns and a repeated request
+    dataset = data_access.EmailDataset(storage.artifact_path('emails', data_dir))
+    bench.measure('dataset_cold_load', lambda: dataset.frame(DATASET_COLUMNS), rows)
+    emails_df = bench.measure('dataset_warm_load', lambda: dataset.frame(DATASET_COLUMNS), rows)
+
+    # Senders page aggregations, unfiltered and for the busiest sender
+    cube_df = bench.measure('load_cube', lambda: cube.read_cube(storage.artifact_path('cube.parquet', data_dir)))
+    sender = cube.counts_by(cube_df, 'From').nlargest(1, 'count')['From'].iloc[0]
+    for filters, suffix in (({}, ''), ({'From': sender}, '_filtered')):
+        for column in SENDERS_COLUMNS:
+            bench.measure(f'senders_count_by_{column.lower()}{suffix}',
+                          lambda: cube.counts_by(cube.apply_filters(cube_df, filters), column))
+    recipients_df = recipients.read_recipients(path=storage.artifact_path('recipients', data_dir))
+    message_ids = cube.apply_filters(emails_df, {'From': sender})['Message-ID']
+    bench.measure('senders_recipient_counts', lambda: recipients.recipient_counts(recipients_df, message_ids),
+                  len(message_ids))
+
+    # Text cleaning throughput
+    contents = storage.read_emails(columns=['Content'], path=storage.artifact_path('emails', data_dir))['Content']
+    contents = contents.head(cleaning_sample).tolist()
+    bench.measure('text_cleaning', lambda: text_cleaning.clean_texts(contents, workers), len(contents))
+
+    # Graph
+    store = bench.measure('prepare_graph', lambda: graph_store.build_graph(data_dir))
+    bench.measure('top_edges_networkx', lambda: graph_store.to_networkx(store.top_edges(100)))
+    bench.measure('centrality', lambda: graph_analytics.compute_metrics(store, workers=workers),
+                  store.number_of_nodes)
+
+    # Conversation threading
+    bench.measure('threads', lambda: threads.build_threads(data_dir), rows)
+    return bench.results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic data sets.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000], help="messages per synthetic data set")
+    parser.add_argument('--workdir', default='benchmark', help="where the synthetic data sets are generated")
+    parser.add_argument('--output', default=None,
+                        help="JSON file to write the results to (default: benchmark.json in the work directory)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="only measure time")
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scales': [],
+    }
+    for n_messages in args.scales:
+        print(f"{n_messages} messages")
+        stages = run_scale(n_messages, args.workdir, args.workers, args.memory)
+        report['scales'].append({'messages': n_messages, 'stages': stages})
+    output = args.output or os.path.join(args.workdir, 'benchmark.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
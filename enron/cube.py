@@ -0,0 +1,76 @@
+"""
+Pre-aggregated message counts for every combination of the Senders page filters.
+
+The cube holds one row per observed (From, Year, Month, Day, Hour, Is-Reply, Is-Forwarded) combination with its message
+count, so sidebar changes only slice and sum a small table instead of scanning the emails.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from enron import storage
+
+CUBE_PATH = storage.artifact_path('cube.parquet')
+KEYS = ['From', 'Year', 'Month', 'Day', 'Hour', 'Is-Reply', 'Is-Forwarded']
+
+SCHEMA = pa.schema([
+    ('From', pa.dictionary(pa.int32(), pa.string())),
+    ('Year', pa.int16()),
+    ('Month', pa.dictionary(pa.int8(), pa.string())),
+    ('Day', pa.dictionary(pa.int8(), pa.string())),
+    ('Hour', pa.int8()),
+    ('Is-Reply', pa.bool_()),
+    ('Is-Forwarded', pa.bool_()),
+    ('count', pa.int32()),
+])
+
+
+def build_cube(df):
+    """
+    Count the messages of a cleaned emails DataFrame for every observed combination of the filter keys.
+    """
+
+    return df.groupby(KEYS, observed=True).size().reset_index(name='count')
+
+
+def merge_cubes(*cubes):
+    """
+    Combine partial cubes (e.g. one per ingested chunk) into a single cube.
+    """
+
+    cubes = [c.astype({'From': str, 'Month': str, 'Day': str}) for c in cubes if c is not None and not c.empty]
+    if not cubes:
+        return pd.DataFrame(columns=KEYS + ['count'])
+    return pd.concat(cubes, ignore_index=True).groupby(KEYS, observed=True)['count'].sum().reset_index()
+
+
+def write_cube(cube, path=CUBE_PATH):
+    pq.write_table(pa.Table.from_pandas(cube, schema=SCHEMA, preserve_index=False), path)
+
+
+def read_cube(path=CUBE_PATH):
+    return pd.read_parquet(path)
+
+
+def apply_filters(frame, filters):
+    """
+    Keep the rows of ``frame`` (a cube or an emails DataFrame) matching every {column: value} pair of ``filters``.
+    """
+
+    mask = pd.Series(True, index=frame.index)
+    for column, value in filters.items():
+        mask &= frame[column] == value
+    return frame[mask]
+
+
+def counts_by(cube_slice, column):
+    """
+    Sum a cube slice over every key but ``column`` and return the non-empty groups as a [column, count] DataFrame,
+    ordered by ``column``.
+    """
+
+    counts = cube_slice.groupby(column, observed=True)['count'].sum()
+    counts = counts[counts > 0].reset_index()
+    if isinstance(counts[column].dtype, pd.CategoricalDtype):
+        counts[column] = counts[column].astype(str)
+    return counts.sort_values(column, ignore_index=True)
@@ -0,0 +1,280 @@
+"""
+Shared data access for the dashboard pages.
+
+Every artifact is loaded once per server process by the ``warmup`` service, which the first page view starts in
+the background, and shared by all pages and sessions. A page run takes one generation of them with
+``get_generation`` and passes it to every getter. Pages call ``require`` with the artifacts a section needs to
+show a progress bar instead of blocking silently while they are still loading.
+Copy-on-write mode is enabled, so the frames handed out are zero-copy views of the shared data and a page that
+modifies its frame only ever changes its own copy.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from enron import (cube, figure_cache, graph_analytics, graph_store, layout, query_backend, recipients,
+                   search_index, sender_summary, storage, term_index, threads, warmup)
+
+pd.set_option('mode.copy_on_write', True)
+
+SENDER_SUMMARY_PATH = 'grouped_emails.csv'
+FIGURES_PATH = storage.artifact_path('figures')
+DEFAULT_EMAIL_COLUMNS = ['Message-ID', 'From', 'Year', 'Month', 'Day', 'Is-Reply', 'Is-Forwarded']
+
+# 'cube' answers the Senders page aggregations from the count cube, 'sqlite' from the SQLite query backend
+QUERY_BACKEND = os.environ.get('ENRON_QUERY_BACKEND', 'cube')
+
+
+class EmailDataset:
+    """
+    Process wide, read only emails data set, partitioned by year and month.
+
+    Columns of a partition are read from Parquet the first time a page asks for them and kept for later requests
+    (the ``max_tables`` most recently used partition reads), so a page filtered to one month only ever loads that
+    month. The partitions next to the ones requested are read ahead on a background thread, since the sidebar
+    usually moves to a neighbouring month next. Reads happen outside of the lock, a request for a partition that is
+    being read waits for that read only.
+    """
+
+    def __init__(self, path=storage.EMAILS_PATH, prefetch=1, max_frames=8, max_tables=64):
+        self.path = path
+        self.prefetch = prefetch
+        self.max_frames = max_frames
+        self.max_tables = max_tables
+        self.partitions = storage.list_partitions(path)
+        self._tables = OrderedDict()
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+    def close(self):
+        """
+        Stop reading ahead and drop the cached partitions, called when its data version is replaced. Later requests
+        still work, reading from Parquet.
+        """
+
+        self.prefetch = 0
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._tables.clear()
+            self._frames.clear()
+
+    def select(self, years=None, months=None):
+        """
+        The partitions touched by the given years and months (all of them when a selection is None).
+        """
+
+        return [(year, month) for year, month in self.partitions
+                if (years is None or year in years) and (months is None or month in months)]
+
+    def _table(self, partition, columns):
+        key = (partition, tuple(columns))
+        with self._lock:
+            future = self._tables.get(key)
+            reader = future is None
+            if reader:
+                future = self._tables[key] = Future()
+                while len(self._tables) > self.max_tables:
+                    self._tables.popitem(last=False)
+            else:
+                self._tables.move_to_end(key)
+        if reader:
+            try:
+                future.set_result(storage.read_partition(partition, columns, self.path))
+            except Exception as error:
+                future.set_exception(error)
+                with self._lock:
+                    if self._tables.get(key) is future:
+                        del self._tables[key]
+        return future.result()
+
+    def _prefetch(self, selected, columns):
+        if not self.prefetch or not selected:
+            return
+        first = self.partitions.index(selected[0])
+        last = self.partitions.index(selected[-1])
+        neighbours = self.partitions[max(first - self.prefetch, 0):first]
+        neighbours += self.partitions[last + 1:last + 1 + self.prefetch]
+        for partition in neighbours:
+            if (partition, tuple(columns)) not in self._tables:
+                try:
+                    self._executor.submit(self._table, partition, columns)
+                except RuntimeError:
+                    # Closed meanwhile
+                    return
+
+    def frame(self, columns, years=None, months=None):
+        """
+        A DataFrame of the requested columns of the partitions touched by ``years`` and ``months``.
+        """
+
+        selected = self.select(years, months)
+        key = (tuple(columns), tuple(selected))
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+        if frame is None:
+            if selected:
+                tables = [self._table(partition, columns) for partition in selected]
+                frame = pa.concat_tables(tables).to_pandas()
+            else:
+                frame = pd.DataFrame({column: [] for column in columns})
+            with self._lock:
+                self._frames[key] = frame
+                while len(self._frames) > self.max_frames:
+                    self._frames.popitem(last=False)
+        self._prefetch(selected, columns)
+        return frame.copy(deep=False)
+
+
+def _read_sender_summary(path):
+    # The summary written at ingest, falling back to the notebook's grouped_emails.csv
+    summary_path = storage.artifact_path('senders.parquet', path)
+    if os.path.exists(summary_path):
+        return sender_summary.to_grouped(sender_summary.read_summary(summary_path))
+    return pd.read_csv(SENDER_SUMMARY_PATH)
+
+
+# Every loader reads from the directory of the data version being loaded
+LOADERS = {
+    'cube': lambda path: cube.read_cube(storage.artifact_path('cube.parquet', path)),
+    'recipients': lambda path: recipients.read_recipients(path=storage.artifact_path('recipients', path)),
+    'metrics': lambda path: graph_analytics.read_metrics(storage.artifact_path('centrality.parquet', path)),
+    'sender summary': _read_sender_summary,
+    'term index': lambda path: term_index.TermIndex.load(storage.artifact_path('terms', path)),
+    'search index': lambda path: search_index.SearchIndex.load(storage.artifact_path('search', path)),
+    'graph': lambda path: graph_store.GraphStore.load(storage.artifact_path('graph', path)),
+    'thread senders': lambda path: threads.read_threads('senders', path=storage.artifact_path('threads', path)),
+    'threads': lambda path: threads.read_threads('threads', path=storage.artifact_path('threads', path)),
+    'dataset': lambda path: EmailDataset(storage.artifact_path('emails', path)),
+}
+if QUERY_BACKEND == 'sqlite':
+    LOADERS['database'] = lambda path: query_backend.EmailDatabase(storage.artifact_path('emails.sqlite', path))
+
+
+def _warmers(layouts):
+    def default_emails(artifacts):
+        # The columns the Senders and Words pages load with their default filters
+        return artifacts['dataset'].frame(DEFAULT_EMAIL_COLUMNS)
+
+    def top_network_layout(artifacts):
+        # The Connections page layout, which only changes with the graph
+        top = graph_store.to_networkx(artifacts['graph'].top_edges(100), directed=True)
+        return layouts.layout(top, k=0.5)
+
+    return {'default emails': default_emails, 'top network layout': top_network_layout}
+
+
+@st.cache_resource
+def get_warmup():
+    """
+    The background loader of every artifact, started by the first page view of the server.
+    """
+
+    return warmup.WarmupService(LOADERS, _warmers(get_layout_cache()), retire=storage.prune_versions).start()
+
+
+def get_generation():
+    """
+    The generation of artifacts the current page run reads from. A page takes it once and passes it to the getters
+    below, so a new data version swapped in during the run does not mix into it.
+    """
+
+    return get_warmup().current
+
+
+def require(*names, generation=None):
+    """
+    Wait for the artifacts ``names`` with a progress bar in place of the page content that needs them.
+    """
+
+    generation = generation or get_generation()
+    if generation.ready(names):
+        return
+    placeholder = st.empty()
+    done, loading = generation.progress(names)
+    while loading:
+        placeholder.progress(done / len(names), text=f"Preparing {', '.join(loading)}...")
+        time.sleep(0.1)
+        done, loading = generation.progress(names)
+    placeholder.empty()
+
+
+def _get(name, generation):
+    return (generation or get_generation()).get(name)
+
+
+def get_dataset(generation=None):
+    return _get('dataset', generation)
+
+
+def get_term_index(generation=None):
+    return _get('term index', generation)
+
+
+def get_search_index(generation=None):
+    return _get('search index', generation)
+
+
+def get_graph(generation=None):
+    return _get('graph', generation)
+
+
+def get_database(generation=None):
+    """
+    The SQLite query backend when it is enabled with ENRON_QUERY_BACKEND=sqlite, otherwise None.
+    """
+
+    if QUERY_BACKEND != 'sqlite':
+        return None
+    return _get('database', generation)
+
+
+@st.cache_resource
+def get_layout_cache():
+    return layout.LayoutCache(max_entries=32)
+
+
+@st.cache_resource
+def get_figure_cache():
+    return figure_cache.FigureCache(max_entries=128, directory=FIGURES_PATH)
+
+
+def get_data_version(generation=None):
+    # The version of the loaded artifacts, which lags the data directory while a new version is loading
+    return (generation or get_generation()).version
+
+
+def get_emails(columns, years=None, months=None, generation=None):
+    return get_dataset(generation).frame(columns, years, months)
+
+
+def get_cube(generation=None):
+    return _get('cube', generation).copy(deep=False)
+
+
+def get_recipients(generation=None):
+    return _get('recipients', generation).copy(deep=False)
+
+
+def get_metrics(generation=None):
+    return _get('metrics', generation).copy(deep=False)
+
+
+def get_sender_summary(generation=None):
+    return _get('sender summary', generation).copy(deep=False)
+
+
+def get_thread_senders(generation=None):
+    return _get('thread senders', generation).copy(deep=False)
+
+
+def get_threads(generation=None):
+    return _get('threads', generation).copy(deep=False)
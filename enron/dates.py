@@ -0,0 +1,137 @@
+"""
+Vectorized parsing of the raw email ``Date`` headers.
+
+Usage: python -m enron.dates emails.csv --sample 5000  (checks the vectorized parser against the legacy one)
+"""
+import argparse
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%a, %d %b %Y %H:%M:%S"
+
+# Some headers carry a two digit year padded with zeros (e.g. "0001")
+YEAR_FIXES = [("0001", "2001"), ("0000", "2000"), ("0002", "2002")]
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def parse_custom_date(date_str):
+    """
+    Legacy per-message parser, kept as the reference implementation for ``validate``.
+    """
+
+    date_str = date_str.replace("0001", "2001")
+    date_str = date_str.replace("0000", "2000")
+    date_str = date_str.replace("0002", "2002")
+    date_str = date_str[:-6].strip()  # Remove offset from date string
+    offset_str = date_str[-5:]  # Extract offset string (e.g., -0800)
+    dt = datetime.strptime(date_str[:-6].strip(), "%a, %d %b %Y %H:%M:%S")  # Parse date string without offset
+    offset_hours = int(offset_str[1:3])
+    offset_minutes = int(offset_str[3:5])
+    # adding offset
+    if offset_str[0] == "-":
+        dt += timedelta(hours=offset_hours, minutes=offset_minutes)
+    else:
+        dt -= timedelta(hours=offset_hours, minutes=offset_minutes)
+    return dt
+
+
+def parse_dates(date_strings, errors='coerce'):
+    """
+    Parse a whole array of ``Date`` headers (e.g. "Mon, 14 May 2001 16:39:00 -0700 (PDT)") to naive UTC timestamps.
+
+    Applies the same year fix-ups and offset handling as ``parse_custom_date``. Unparsable headers become NaT unless
+    ``errors='raise'``.
+    """
+
+    s = pd.Series(date_strings, copy=False)
+    for old, new in YEAR_FIXES:
+        s = s.str.replace(old, new, regex=False)
+    s = s.str[:-6].str.strip()  # Remove the timezone name, e.g. " (PDT)"
+    offset = s.str[-5:]
+    dates = pd.to_datetime(s.str[:-6].str.strip(), format=DATE_FORMAT, errors=errors)
+
+    # Shift by the numeric offset, "-0700" means 7 hours behind UTC
+    minutes = (pd.to_numeric(offset.str[1:3], errors=errors) * 60 + pd.to_numeric(offset.str[3:5], errors=errors))
+    sign = np.where(offset.str[0] == '-', 1, -1)
+    return dates + pd.to_timedelta(minutes * sign, unit='m')
+
+
+def date_parts(dates):
+    """
+    Derive the Year, Month, Day and Hour columns used by the sidebar filters from parsed dates.
+
+    Month and Day come back as categoricals with calendar ordered categories.
+    """
+
+    dates = pd.Series(dates, copy=False)
+    month = dates.dt.month.fillna(0).to_numpy(dtype=np.int8) - 1
+    day = dates.dt.dayofweek.fillna(-1).to_numpy(dtype=np.int8)
+    return pd.DataFrame({
+        'Year': dates.dt.year.fillna(0).to_numpy(dtype=np.int16),
+        'Month': pd.Categorical.from_codes(month, MONTHS),
+        'Day': pd.Categorical.from_codes(day, DAYS),
+        'Hour': dates.dt.hour.fillna(0).to_numpy(dtype=np.int8),
+    }, index=dates.index)
+
+
+def parse_dates_with_parts(date_strings, errors='coerce'):
+    """
+    Parse ``Date`` headers and return a DataFrame with the Date, Year, Month, Day and Hour columns.
+    """
+
+    dates = parse_dates(date_strings, errors)
+    parts = date_parts(dates)
+    parts.insert(0, 'Date', dates)
+    return parts
+
+
+def validate(date_strings, sample=1000, seed=0):
+    """
+    Compare ``parse_dates`` with the legacy ``parse_custom_date`` on a random sample of headers.
+
+    Returns a dict with the number of checked headers, the number of mismatches and a DataFrame of the mismatching
+    rows. Headers the legacy parser rejects count as NaT.
+    """
+
+    s = pd.Series(date_strings, copy=False).dropna()
+    s = s.sample(n=min(sample, len(s)), random_state=seed)
+
+    def legacy(date_str):
+        try:
+            return parse_custom_date(date_str)
+        except ValueError:
+            return pd.NaT
+
+    expected = pd.to_datetime(s.map(legacy))
+    actual = parse_dates(s)
+    mismatch = ~((expected == actual) | (expected.isna() & actual.isna()))
+    return {
+        'checked': len(s),
+        'mismatches': int(mismatch.sum()),
+        'examples': pd.DataFrame({'Date': s, 'legacy': expected, 'vectorized': actual})[mismatch],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the vectorized date parser against the legacy parser.")
+    parser.add_argument('source', help="raw emails.csv (columns: file, message)")
+    parser.add_argument('--sample', type=int, default=1000, help="number of headers to compare")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    messages = pd.read_csv(args.source, usecols=['message'])['message']
+    headers = messages.str.extract(r'^Date: (.*)$', flags=re.MULTILINE, expand=False)
+    report = validate(headers, args.sample, args.seed)
+    print(f"Checked {report['checked']} dates, {report['mismatches']} mismatches")
+    if report['mismatches']:
+        print(report['examples'].head(20).to_string())
+
+
+if __name__ == '__main__':
+    main()
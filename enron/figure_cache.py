@@ -0,0 +1,102 @@
+"""
+Cache of rendered chart images keyed by (chart, filter state, data version).
+
+Repeat views of a chart with the same inputs are served as PNG bytes without running pandas, seaborn or matplotlib
+again. Entries are evicted least recently used first, in memory and (optionally) on disk.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from matplotlib import pyplot as plt
+
+
+def figure_to_png(fig, dpi=200):
+    """
+    Render a figure to PNG bytes (with the settings ``st.pyplot`` uses) and close it.
+    """
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """
+    Thread safe LRU cache of PNG images. When ``directory`` is given, images are also written there and survive a
+    server restart; at most ``max_disk_entries`` files are kept.
+    """
+
+    def __init__(self, max_entries=128, directory=None, max_disk_entries=1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(chart, filters=(), version=None):
+        return hashlib.sha1(repr((chart, tuple(filters), version)).encode()).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f'{key}.png')
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as f:
+                png = f.read()
+            os.utime(self._disk_path(key))
+            self._remember(key, png)
+            return png
+        return None
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, png):
+        self._remember(key, png)
+        if self.directory:
+            tmp_path = self._disk_path(key) + f'.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.png')]
+        if len(files) > self.max_disk_entries:
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.max_disk_entries]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def render(self, chart, filters, version, draw):
+        """
+        PNG of ``chart`` for the given filter state and data version. ``draw`` is only called (and must return a
+        matplotlib figure) when the image is not cached yet.
+        """
+
+        key = self.key(chart, filters, version)
+        png = self.get(key)
+        if png is None:
+            png = figure_to_png(draw())
+            self.put(key, png)
+        return png
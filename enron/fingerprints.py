@@ -0,0 +1,82 @@
+"""
+Message fingerprints for incremental ingest.
+
+Every message written by an ingest is recorded by its Message-ID and a hash of the raw text. A later ingest of the
+same source only parses the messages that are new or whose text changed since. Messages the parser drops (outside
+of the ``--start``/``--end`` window, or missing a header) are not recorded, so a later ingest looks at them again.
+"""
+import hashlib
+
+import pandas as pd
+
+from enron import storage
+
+FINGERPRINTS_PATH = storage.artifact_path('fingerprints.parquet')
+
+MESSAGE_ID_PATTERN = r'(?m)^Message-ID:[ \t]*(.*?)[ \t]*\r?$'
+
+
+def fingerprint(messages):
+    """
+    Message-ID and raw text hash of every message of a Series of raw emails.
+    """
+
+    return pd.DataFrame({
+        'Message-ID': messages.str.extract(MESSAGE_ID_PATTERN, expand=False).to_numpy(),
+        'Fingerprint': [hashlib.blake2b(message.encode(), digest_size=8).hexdigest() for message in messages],
+    })
+
+
+class FingerprintTracker:
+    """
+    Selects the raw messages an ingest has to parse and records the fingerprints of everything it saw.
+
+    ``select`` is meant as the ``select`` hook of ``ingest.iter_parsed_chunks`` and ``track`` wraps the cleaned
+    chunks it yields, to learn which of the selected messages were kept. Once the chunks are consumed, ``changed``
+    holds the Message-IDs that were already ingested with a different text.
+    """
+
+    def __init__(self, known=None):
+        self.known = known if known is not None else pd.Series(dtype=object, name='Fingerprint')
+        self.seen = []
+        self.kept = set()
+        self.changed = []
+
+    def select(self, chunk):
+        fingerprints = fingerprint(chunk['message'])
+        previous = self.known.reindex(fingerprints['Message-ID']).to_numpy()
+        new = pd.isna(previous) | fingerprints['Message-ID'].isna().to_numpy()
+        changed = ~new & (previous != fingerprints['Fingerprint'].to_numpy())
+        self.changed.extend(fingerprints.loc[changed, 'Message-ID'])
+        self.seen.append(fingerprints[new | changed])
+        return chunk[new | changed]
+
+    def track(self, chunks):
+        """
+        Pass the cleaned chunks through, recording the Message-IDs that made it into them.
+        """
+
+        for chunk in chunks:
+            self.kept.update(chunk['Message-ID'])
+            yield chunk
+
+    def fingerprints(self):
+        """
+        Known fingerprints updated with the ones of the messages kept since, indexed by Message-ID.
+
+        A changed message that was not kept had its old rows removed, so it is forgotten as well.
+        """
+
+        seen = pd.concat([frame.dropna() for frame in self.seen] or [fingerprint(pd.Series(dtype=object))])
+        kept = seen['Message-ID'].isin(self.kept)
+        known = self.known[~self.known.index.isin(seen.loc[~kept, 'Message-ID'])]
+        merged = pd.concat([known, seen[kept].set_index('Message-ID')['Fingerprint']])
+        return merged[~merged.index.duplicated(keep='last')]
+
+    def save(self, path=FINGERPRINTS_PATH):
+        self.fingerprints().rename_axis('Message-ID').reset_index().to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path=FINGERPRINTS_PATH):
+        known = pd.read_parquet(path).set_index('Message-ID')['Fingerprint']
+        return cls(known)
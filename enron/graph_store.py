@@ -0,0 +1,169 @@
+"""
+Persistent sender -> recipient communication graph.
+
+Nodes are email addresses with integer ids, edge weights (number of single recipient messages) live in a sparse
+adjacency matrix. The store is built at ingest and can be updated with new or removed messages without a rebuild.
+
+Usage: python -m enron.graph_store [data]  (rebuilds the graph of an ingested data directory)
+"""
+import argparse
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from enron import recipients, storage
+
+GRAPH_PATH = storage.artifact_path('graph')
+
+
+class GraphStore:
+    """
+    Weighted directed graph, ``weights[i, j]`` is the number of messages node ``i`` sent to node ``j``.
+    """
+
+    def __init__(self, nodes=(), weights=None):
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+        self.weights = weights.tocsr() if weights is not None else sparse.csr_matrix((n, n), dtype=np.int64)
+        self._edges = None
+
+    @property
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def number_of_edges(self):
+        return self.weights.nnz
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Build a store from a DataFrame of From, To and count columns.
+        """
+
+        store = cls()
+        store.add_edges(edges)
+        return store
+
+    def _ids(self, addresses):
+        ids = np.empty(len(addresses), dtype=np.int64)
+        for i, address in enumerate(addresses):
+            node_id = self.node_ids.get(address)
+            if node_id is None:
+                node_id = self.node_ids[address] = len(self.node_ids)
+            ids[i] = node_id
+        return ids
+
+    def add_edges(self, edges):
+        """
+        Add the counts of a From, To, count DataFrame to the graph, creating nodes for new addresses.
+        """
+
+        src = self._ids(edges['From'].astype(str).tolist())
+        dst = self._ids(edges['To'].astype(str).tolist())
+        n = len(self.node_ids)
+        if n > len(self.nodes):
+            self.nodes = np.concatenate([self.nodes, np.array(list(self.node_ids)[len(self.nodes):], dtype=object)])
+            w = self.weights
+            self.weights = sparse.csr_matrix((w.data, w.indices, np.pad(w.indptr, (0, n - w.shape[0]), mode='edge')),
+                                             shape=(n, n))
+        delta = sparse.csr_matrix((edges['count'].to_numpy(dtype=np.int64), (src, dst)), shape=(n, n))
+        self.weights = (self.weights + delta).tocsr()
+        self._edges = None
+
+    def add_messages(self, new_recipients):
+        """
+        Count newly ingested messages, given as rows of the recipients table.
+        """
+
+        self.add_edges(recipients.edge_counts(new_recipients))
+
+    def remove_messages(self, old_recipients):
+        """
+        Uncount messages removed from the data set, given as their rows of the recipients table.
+        """
+
+        edges = recipients.edge_counts(old_recipients)
+        edges['count'] = -edges['count']
+        self.add_edges(edges)
+        self.weights.eliminate_zeros()
+
+    def edge_list(self):
+        """
+        All edges as a From, To, count DataFrame, heaviest first. Computed once and reused until the graph changes.
+        """
+
+        if self._edges is None:
+            coo = self.weights.tocoo()
+            order = np.argsort(-coo.data, kind='stable')
+            self._edges = pd.DataFrame({'From': self.nodes[coo.row[order]], 'To': self.nodes[coo.col[order]],
+                                        'count': coo.data[order]})
+        return self._edges
+
+    def top_edges(self, n):
+        return self.edge_list().head(n)
+
+    def random_edges(self, frac=0.01, seed=0):
+        """
+        The edges between the endpoints of a random ``frac`` of all edges.
+        """
+
+        edges = self.edge_list()
+        random_subset = edges.sample(frac=frac, random_state=seed)
+        keep = np.zeros(self.number_of_nodes, dtype=np.int64)
+        keep[[self.node_ids[node] for node in np.unique(random_subset[['From', 'To']].values)]] = 1
+        mask = sparse.diags(keep)
+        sub = (mask @ self.weights @ mask).tocoo()
+        sub.eliminate_zeros()
+        order = np.argsort(-sub.data, kind='stable')
+        return pd.DataFrame({'From': self.nodes[sub.row[order]], 'To': self.nodes[sub.col[order]],
+                             'count': sub.data[order]})
+
+    def save(self, path=GRAPH_PATH):
+        os.makedirs(path, exist_ok=True)
+        pd.DataFrame({'Node': self.nodes}).to_parquet(os.path.join(path, 'nodes.parquet'))
+        sparse.save_npz(os.path.join(path, 'weights.npz'), self.weights)
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        nodes = pd.read_parquet(os.path.join(path, 'nodes.parquet'))['Node'].to_numpy()
+        return cls(nodes, sparse.load_npz(os.path.join(path, 'weights.npz')))
+
+
+def to_networkx(edges, directed=False):
+    """
+    NetworkX graph of a From, To, count edge DataFrame, e.g. ``top_edges`` or ``random_edges``.
+    """
+
+    return nx.from_pandas_edgelist(edges, source='From', target='To', edge_attr='count',
+                                   create_using=nx.DiGraph if directed else nx.Graph)
+
+
+def build_graph(data_dir=storage.DATA_DIR):
+    """
+    Build and save the graph of an ingested data directory from its recipients table.
+    """
+
+    table = recipients.read_recipients(columns=['From', 'To', 'Recipient-Count'],
+                                       filters=[('Recipient-Count', '==', 1)],
+                                       path=storage.artifact_path('recipients', data_dir))
+    store = GraphStore.from_edges(recipients.edge_counts(table))
+    store.save(storage.artifact_path('graph', data_dir))
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the communication graph of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    args = parser.parse_args(argv)
+    with storage.rebuild_version(args.data_dir, rebuilt=['graph']) as path:
+        store = build_graph(path)
+    print(f"Graph with {store.number_of_nodes} nodes and {store.number_of_edges} edges")
+
+
+if __name__ == '__main__':
+    main()
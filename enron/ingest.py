@@ -0,0 +1,328 @@
+"""
+Streaming ingestion of the raw Enron ``emails.csv`` into the cleaned data set used by the dashboard pages.
+
+Every ingest into a data directory writes a new version directory (an incremental one starts from a copy of the
+current version) and publishes it once all artifacts are written, see ``storage``. The dashboard keeps serving the
+previous version meanwhile and removes the version directories it no longer needs after switching.
+
+Usage: python -m enron.ingest emails.csv [data | modified_emails.csv] --workers 8 [--incremental]
+"""
+import argparse
+import email
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from enron import (cube, dates, fingerprints, graph_analytics, graph_store, query_backend, recipients, search_index,
+                   sender_summary, storage, term_index, threads, word_counts)
+
+# Email headers we keep from every message, in the order the notebook produced them
+HEADERS = ['Message-ID', 'Date', 'From', 'To', 'Subject', 'X-From', 'X-To', 'X-cc', 'X-bcc', 'X-Folder']
+
+# Final column order of the cleaned data set (as written by the notebook)
+COLUMNS = ['Message-ID', 'From', 'To', 'Subject', 'Date', 'Cc', 'Bcc', 'X-From', 'X-To', 'Content', 'Folder-Name',
+           'Is-Forwarded', 'Forward-Content', 'Year', 'Month', 'Day', 'Hour', 'Is-Reply']
+
+FORWARD_SEPARATOR = '---------------------- '
+
+
+# gets the text from emails
+def get_text_from_email(email_msg):
+    contents = []
+    if email_msg.is_multipart():
+        for part in email_msg.get_payload():
+            if part.get_content_type() == 'text/plain':
+                contents.append(part.get_payload())
+    else:
+        if email_msg.get_content_type() == 'text/plain':
+            contents.append(email_msg.get_payload())
+    return ''.join(contents)
+
+
+# Split a string(df) of email address of senders/receivers to a list of multiple address
+def split_email_addresses(address_list):
+    if address_list:
+        address = address_list.split(',')
+        address = list(set(map(lambda x: x.strip(), address)))
+    else:
+        address = None
+    return address
+
+
+def split_content(content):
+    content = content.split(FORWARD_SEPARATOR, 1)[0].rstrip()
+    if content == "":
+        return np.nan
+    else:
+        return content
+
+
+def split_forward_content(content):
+    split_result = content.split(FORWARD_SEPARATOR, 1)
+    if len(split_result) == 2:
+        return split_result[1].lstrip()
+    else:
+        return np.nan
+
+
+def parse_chunk(chunk, start=None, end=None):
+    """
+    Turn a chunk of raw ``emails.csv`` rows into cleaned rows with the columns the dashboard pages expect.
+
+    Messages dated outside of [start, end) are dropped when the bounds are given.
+    """
+
+    emails = list(map(email.message_from_string, chunk['message']))
+    df = pd.DataFrame({key: [msg[key] for msg in emails] for key in HEADERS})
+    df['Content'] = list(map(get_text_from_email, emails))
+
+    # Date, Year, Month, Day and Hour come out of one vectorized pass over the headers
+    parsed = dates.parse_dates_with_parts(df.pop('Date'))
+    df = pd.concat([df, parsed], axis=1)
+    if start is not None:
+        df = df.loc[df['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df.loc[df['Date'] < pd.Timestamp(end)]
+
+    # Split multiple email addresses
+    df['From'] = df['From'].map(split_email_addresses)
+    df['From'] = df['From'].map(lambda x: ', '.join(x) if x else None)
+    df['To'] = df['To'].map(split_email_addresses)
+    df = df.rename(columns={'X-cc': 'Cc', 'X-bcc': 'Bcc', 'X-Folder': 'Folder-Name'})
+    df = df.dropna().reset_index(drop=True)
+
+    # Forward content and reply flag
+    df['Is-Forwarded'] = df['Content'].str.contains('---------------------- Forwarded', regex=False)
+    df['Forward-Content'] = df['Content'].map(split_forward_content).where(df['Is-Forwarded'])
+    df['Content'] = df['Content'].map(split_content)
+    df['Is-Reply'] = df['Subject'].str.contains('Re:', case=False, regex=False).fillna(False)
+    return df[COLUMNS]
+
+
+def iter_parsed_chunks(source, chunksize=10000, workers=None, start=None, end=None, select=None):
+    """
+    Read ``source`` in chunks and yield the cleaned chunks in input order.
+
+    Chunks are parsed across a process pool. At most ``2 * workers`` chunks are in flight at once, so memory stays
+    bounded no matter how large the source file is. ``select`` is called on every raw chunk before it is parsed and
+    returns the rows to parse (see ``fingerprints.FingerprintTracker``).
+    """
+
+    workers = workers or os.cpu_count() or 1
+    reader = pd.read_csv(source, chunksize=chunksize)
+    if select is not None:
+        reader = (chunk for chunk in map(select, reader) if not chunk.empty)
+    if workers == 1:
+        for chunk in reader:
+            yield parse_chunk(chunk, start, end)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in reader:
+            pending.append(pool.submit(parse_chunk, chunk, start, end))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_csv(chunks, path):
+    """
+    Stream cleaned chunks into a single CSV file and return the number of rows written.
+    """
+
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, data_dir=storage.DATA_DIR, word_count_mode='nltk', workers=None, database=False):
+    """
+    Stream cleaned chunks into the Parquet data set and the recipients table of ``data_dir``, then write the filter
+    count cube, the per-sender summary, the communication graph with its centrality metrics, the term index, the
+    search index, the conversation threads and, with ``database``, the SQLite database. A database left by an earlier
+    ingest is removed otherwise, since it would describe the previous data. Returns the number of rows written.
+
+    ``workers`` bounds the worker processes of the word counts, the text cleaning and the closeness computation.
+    """
+
+    emails_path = storage.artifact_path('emails', data_dir)
+    recipients_path = storage.artifact_path('recipients', data_dir)
+    storage.reset_dataset(emails_path)
+    storage.reset_dataset(recipients_path)
+    rows = 0
+    counts = None
+    senders = None
+    for i, chunk in enumerate(chunks):
+        if chunk.empty:
+            continue
+        storage.append_chunk(chunk, i, emails_path)
+        recipients.append_recipients(chunk, i, recipients_path)
+        counts = cube.merge_cubes(counts, cube.build_cube(chunk))
+        senders = sender_summary.update_summary(senders, chunk, word_count_mode, workers)
+        rows += len(chunk)
+    cube.write_cube(cube.merge_cubes(counts), storage.artifact_path('cube.parquet', data_dir))
+    sender_summary.write_summary(sender_summary.merge_summaries(senders),
+                                 storage.artifact_path('senders.parquet', data_dir), word_count_mode)
+    graph_store.build_graph(data_dir)
+    graph_analytics.build_metrics(data_dir, workers=workers)
+    term_index.build_term_index(data_dir, workers=workers)
+    search_index.build_search_index(data_dir)
+    threads.build_threads(data_dir)
+    database_path = storage.artifact_path('emails.sqlite', data_dir)
+    if database:
+        query_backend.build_database(data_dir, mode=word_count_mode, workers=workers)
+    elif os.path.exists(database_path):
+        os.remove(database_path)
+    return rows
+
+
+def update_parquet(chunks, tracker, data_dir=storage.DATA_DIR, word_count_mode='nltk', workers=None,
+                   database=False):
+    """
+    Apply an incremental ingest to an existing data directory and return the number of rows written.
+
+    The cleaned chunks hold the new and changed messages selected by ``tracker``. They are appended to the data set
+    and the recipients table, the previous rows of changed messages are removed from the files holding them, and the
+    cube, the sender summary, the graph, the term index, the search index and the SQLite database (when present) are
+    updated with the difference; with ``database`` a missing database is built. The sender summary and the database
+    are rebuilt instead when they hold word counts of another ``word_count_mode``. Centrality metrics depend on the
+    whole graph and conversations can span old and new messages, so both are recomputed.
+    """
+
+    emails_path = storage.artifact_path('emails', data_dir)
+    recipients_path = storage.artifact_path('recipients', data_dir)
+    email_files = storage.dataset_files(emails_path)
+    recipient_files = storage.dataset_files(recipients_path)
+    first_email_chunk = storage.next_chunk_id(emails_path)
+    first_recipient_chunk = storage.next_chunk_id(recipients_path)
+    added = []
+    for i, chunk in enumerate(chunks):
+        if chunk.empty:
+            continue
+        storage.append_chunk(chunk, first_email_chunk + i, emails_path)
+        recipients.append_recipients(chunk, first_recipient_chunk + i, recipients_path)
+        added.append(chunk)
+    database_path = storage.artifact_path('emails.sqlite', data_dir)
+    if not added and not tracker.changed:
+        if database and not os.path.exists(database_path):
+            query_backend.build_database(data_dir, mode=word_count_mode, workers=workers)
+        return 0
+    removed = storage.remove_messages(tracker.changed, email_files)
+    removed_recipients = storage.remove_messages(tracker.changed, recipient_files)
+
+    cube_path = storage.artifact_path('cube.parquet', data_dir)
+    summary_path = storage.artifact_path('senders.parquet', data_dir)
+    counts = [cube.read_cube(cube_path)] + [cube.build_cube(chunk) for chunk in added]
+    if not removed.empty:
+        old_counts = cube.build_cube(removed)
+        old_counts['count'] = -old_counts['count']
+        counts.append(old_counts)
+    counts = cube.merge_cubes(*counts)
+    cube.write_cube(counts[counts['count'] > 0], cube_path)
+    if sender_summary.summary_mode(summary_path) == word_count_mode:
+        senders = [sender_summary.read_summary(summary_path)]
+        senders += [sender_summary.build_summary(chunk, word_count_mode, workers) for chunk in added]
+        if not removed.empty:
+            old_senders = sender_summary.build_summary(removed, word_count_mode, workers)
+            old_senders[sender_summary.TOTALS] = -old_senders[sender_summary.TOTALS]
+            senders.append(old_senders)
+        senders = sender_summary.merge_summaries(*senders)
+        sender_summary.write_summary(senders[senders['Emails_Sent'] > 0], summary_path, word_count_mode)
+    else:
+        # Totals counted in another word count mode cannot be added to, recount every message
+        sender_summary.build_sender_summary(data_dir, word_count_mode, workers)
+
+    graph_path = storage.artifact_path('graph', data_dir)
+    store = graph_store.GraphStore.load(graph_path)
+    for chunk in added:
+        store.add_messages(recipients.build_recipients(chunk))
+    if not removed_recipients.empty:
+        store.remove_messages(removed_recipients)
+    store.save(graph_path)
+    graph_analytics.build_metrics(data_dir, workers=workers)
+
+    terms_path = storage.artifact_path('terms', data_dir)
+    builder = term_index.TermIndexBuilder.from_index(term_index.TermIndex.load(terms_path).without(tracker.changed),
+                                                     workers)
+    for chunk in added:
+        builder.add(chunk)
+    builder.build().save(terms_path)
+    search = search_index.SearchIndex.load(storage.artifact_path('search', data_dir))
+    search.delete(tracker.changed)
+    if added:
+        search.add(pd.concat(added, ignore_index=True))
+
+    threads.build_threads(data_dir)
+    if os.path.exists(database_path) and query_backend.word_count_mode(database_path) == word_count_mode:
+        query_backend.update_database(added, tracker.changed, database_path, word_count_mode, workers)
+    elif database or os.path.exists(database_path):
+        query_backend.build_database(data_dir, mode=word_count_mode, workers=workers)
+    return sum(len(chunk) for chunk in added)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse the raw Enron emails.csv into the dashboard data set.")
+    parser.add_argument('source', help="raw emails.csv (columns: file, message)")
+    parser.add_argument('output', nargs='?', default=storage.DATA_DIR,
+                        help="data directory to write the Parquet data set and its artifacts to, "
+                             "or a .csv file for the legacy layout")
+    parser.add_argument('--chunksize', type=int, default=10000, help="messages parsed per task")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--start', default=None, help="keep messages from this date on (default: the whole corpus)")
+    parser.add_argument('--end', default=None, help="keep messages before this date (default: the whole corpus)")
+    parser.add_argument('--word-count', choices=word_counts.MODES, default='nltk',
+                        help="word count mode of the per-sender summary")
+    parser.add_argument('--database', action='store_true', help="also build the SQLite query backend")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only parse messages that are new or changed since the last ingest into the data "
+                             "directory and update its artifacts")
+    args = parser.parse_args(argv)
+
+    if args.output.endswith('.csv'):
+        chunks = iter_parsed_chunks(args.source, args.chunksize, args.workers, args.start, args.end)
+        rows = write_csv(chunks, args.output)
+        print(f"Wrote {rows} emails to {args.output}")
+        return
+
+    current_path = storage.current_path(args.output)
+    fingerprints_path = storage.artifact_path('fingerprints.parquet', current_path)
+    incremental = args.incremental and os.path.exists(fingerprints_path)
+    if args.incremental and not incremental:
+        print(f"No previous ingest found in {args.output}, running a full ingest")
+    if incremental:
+        tracker = fingerprints.FingerprintTracker.load(fingerprints_path)
+    else:
+        tracker = fingerprints.FingerprintTracker()
+    had_database = os.path.exists(storage.artifact_path('emails.sqlite', current_path))
+
+    version, path = storage.new_version(args.output, base=current_path if incremental else None)
+    try:
+        chunks = tracker.track(iter_parsed_chunks(args.source, args.chunksize, args.workers, args.start, args.end,
+                                                  tracker.select))
+        if incremental:
+            rows = update_parquet(chunks, tracker, path, args.word_count, args.workers, args.database)
+            print(f"{len(tracker.changed)} of the ingested emails had changed")
+        else:
+            rows = write_parquet(chunks, path, args.word_count, args.workers, args.database)
+        tracker.save(storage.artifact_path('fingerprints.parquet', path))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    if incremental and not rows and not tracker.changed and (had_database or not args.database):
+        # Nothing changed, the current version stays
+        shutil.rmtree(path)
+    else:
+        storage.write_version(args.output, version)
+    print(f"Wrote {rows} emails to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Node layouts for the Connections page plots, with a keyed LRU cache so a subgraph is only laid out once.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+
+# Graphs above this many nodes use the vectorized layout instead of NetworkX's spring layout
+FAST_LAYOUT_NODES = 500
+
+# Rows of the pairwise repulsion computed at once by fast_layout
+REPULSION_BATCH = 1024
+
+
+def graph_key(graph, method, params):
+    """
+    Stable key of a graph's structure together with the layout method and its parameters.
+    """
+
+    digest = hashlib.sha1()
+    digest.update(repr((method, sorted(params.items()), graph.is_directed())).encode())
+    for u, v in sorted((str(u), str(v)) for u, v in graph.edges()):
+        digest.update(f'{u}\0{v}\n'.encode())
+    for node in sorted(str(node) for node in nx.isolates(graph)):
+        digest.update(f'{node}\n'.encode())
+    return digest.hexdigest()
+
+
+def fast_layout(graph, k=None, iterations=30, seed=0):
+    """
+    Fruchterman-Reingold force layout computed with NumPy, starting from a sparse spectral layout.
+
+    Repulsion is computed in row batches, so memory stays bounded for graphs with thousands of nodes.
+    """
+
+    nodes = list(graph.nodes)
+    n = len(nodes)
+    if n <= 2:
+        return nx.circular_layout(graph)
+    try:
+        init = nx.spectral_layout(graph)
+        pos = np.array([init[node] for node in nodes], dtype=float)
+    except Exception:  # spectral layouts can fail to converge on very irregular graphs
+        pos = np.random.default_rng(seed).random((n, 2))
+    pos += np.random.default_rng(seed).normal(scale=1e-3, size=pos.shape)  # break ties between identical positions
+    pos = pos.astype(np.float32)
+
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in graph.edges()], dtype=np.int64).reshape(-1, 2)
+    k = k or 1 / np.sqrt(n)
+    t = max(np.ptp(pos[:, 0]), np.ptp(pos[:, 1])) * 0.1
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        displacement = np.zeros_like(pos)
+        x, y = pos[:, 0], pos[:, 1]
+        for start in range(0, n, REPULSION_BATCH):
+            dx = x[start:start + REPULSION_BATCH, None] - x[None, :]
+            dy = y[start:start + REPULSION_BATCH, None] - y[None, :]
+            force = k * k / np.maximum(dx * dx + dy * dy, 1e-4)
+            displacement[start:start + REPULSION_BATCH, 0] += (dx * force).sum(axis=1)
+            displacement[start:start + REPULSION_BATCH, 1] += (dy * force).sum(axis=1)
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            distance = np.maximum(np.sqrt((delta * delta).sum(axis=1)), 0.01)
+            force = delta * (distance / k)[:, None]
+            np.subtract.at(displacement, edges[:, 0], force)
+            np.add.at(displacement, edges[:, 1], force)
+        length = np.maximum(np.sqrt((displacement * displacement).sum(axis=1)), 0.01)
+        pos += displacement * (np.minimum(length, t) / length)[:, None]
+        t -= dt
+    pos = nx.rescale_layout(pos)
+    return dict(zip(nodes, pos))
+
+
+def compute_layout(graph, method='auto', k=None, seed=0):
+    """
+    Deterministic layout of ``graph``: 'spring' (NetworkX), 'fast' (``fast_layout``) or 'auto' to pick by size.
+    """
+
+    if method == 'auto':
+        method = 'spring' if graph.number_of_nodes() <= FAST_LAYOUT_NODES else 'fast'
+    if method == 'spring':
+        return nx.spring_layout(graph, k=k, seed=seed)
+    return fast_layout(graph, k=k, seed=seed)
+
+
+class LayoutCache:
+    """
+    Thread safe LRU cache of node positions keyed by (graph structure, method, parameters).
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def layout(self, graph, method='auto', k=None, seed=0):
+        key = graph_key(graph, method, {'k': k, 'seed': seed})
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        pos = compute_layout(graph, method, k, seed)
+        with self._lock:
+            self._entries[key] = pos
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return pos
@@ -0,0 +1,24 @@
+"""
+The process pool shared by the batch text processing of ingest (text cleaning and nltk word counts).
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+_pool = None
+_workers = None
+
+
+def get_pool(workers):
+    """
+    A pool of ``workers`` processes, created on first use and reused by later calls asking for the same size.
+    """
+
+    global _pool, _workers
+    if _pool is None or _workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        # spawn rather than fork: ingest runs these batches while its parsing pool's management thread and Arrow's
+        # threads are alive, and a forked child could inherit a lock one of them was holding
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _workers = workers
+    return _pool
@@ -0,0 +1,177 @@
+"""
+Lightweight stage timing for the dashboard pages.
+
+A page creates a ``PageTimer`` with ``start_page`` right after ``st.set_page_config``, wraps its hot paths in
+``with perf.stage(name) as stage`` blocks (setting ``stage['rows']`` where a row count means something) and calls
+``perf.show()`` at the end. Every rerun records the wall time, row count and resident memory change of each stage.
+
+The sidebar gets a "Performance" section with two opt-in switches: a panel with the timings of the last rerun, a
+JSON download and the state of the background loading, and cProfile runs of the following interactions, whose
+statistics are shown and offered as a ``.prof`` download (readable with ``pstats`` or snakeviz). With
+ENRON_PROFILE_LOG set to a path, every rerun is also appended to that file as one JSON line.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from enron import data_access
+
+PROFILE_LOG = os.environ.get('ENRON_PROFILE_LOG')
+PANEL_KEY = 'performance_panel'
+PROFILE_KEY = 'performance_profile'
+
+# Enabled profilers by the script thread of the rerun that enabled them, until its ``show`` disables them
+_profilers = {}
+_profilers_lock = threading.Lock()
+
+
+def memory_usage():
+    """
+    Resident memory of the process in bytes (the peak on platforms without /proc).
+    """
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS, only reached on the latter
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _enable(profiler):
+    """
+    Enable ``profiler`` for the calling rerun, first disabling the ones of reruns that never reached ``show``.
+    """
+
+    current = threading.current_thread()
+    with _profilers_lock:
+        for thread, running in list(_profilers.items()):
+            # A session reruns on its script thread, so a profiler is left over from an interrupted rerun (a new
+            # rerun or a stop raised in the script) once its thread runs another rerun or has ended
+            if thread is current or not thread.is_alive():
+                running.disable()
+                del _profilers[thread]
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another session is being profiled, newer Pythons allow one profiler at a time
+            return False
+        _profilers[current] = profiler
+        return True
+
+
+def _disable(profiler):
+    with _profilers_lock:
+        profiler.disable()
+        for thread, running in list(_profilers.items()):
+            if running is profiler:
+                del _profilers[thread]
+
+
+class PageTimer:
+    """
+    Stage timings of one rerun of a page, optionally under cProfile.
+    """
+
+    def __init__(self, page, profile=False):
+        self.page = page
+        self.stages = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.profiler = cProfile.Profile() if profile else None
+        if self.profiler is not None and not _enable(self.profiler):
+            self.profiler = None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Time the block as stage ``name``. The yielded record takes a ``rows`` count set inside the block.
+        """
+
+        record = {'stage': name, 'rows': rows}
+        memory = memory_usage()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if record['rows'] is not None:
+                record['rows'] = int(record['rows'])
+            record['memory_delta_bytes'] = memory_usage() - memory
+            self.stages.append(record)
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self._start
+
+    def to_frame(self):
+        return pd.DataFrame(self.stages, columns=['stage', 'seconds', 'rows', 'memory_delta_bytes'])
+
+    def to_json(self):
+        return json.dumps({'page': self.page, 'started': self.started, 'total_seconds': self.total_seconds,
+                           'memory_bytes': memory_usage(), 'stages': self.stages})
+
+    def profile_stats(self, limit=30):
+        """
+        Stop the cProfile run and return the top functions by cumulative time as text and the raw ``.prof`` dump.
+        """
+
+        _disable(self.profiler)
+        text = io.StringIO()
+        pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(limit)
+        with tempfile.NamedTemporaryFile(suffix='.prof') as f:
+            self.profiler.dump_stats(f.name)
+            dump = f.read()
+        return text.getvalue(), dump
+
+    def show(self):
+        """
+        Finish the rerun: log it and render the sidebar performance section.
+        """
+
+        profile = self.profile_stats() if self.profiler is not None else None
+        if PROFILE_LOG:
+            with open(PROFILE_LOG, 'a') as f:
+                f.write(self.to_json() + '\n')
+
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("Performance")
+        show_panel = st.sidebar.checkbox("Show Performance Panel", key=PANEL_KEY)
+        st.sidebar.checkbox("Profile Interactions", key=PROFILE_KEY)
+        if show_panel:
+            st.sidebar.caption(f"Last rerun: {self.total_seconds * 1000:.0f} ms, "
+                               f"{memory_usage() / 2 ** 20:.0f} MiB resident")
+            timings = self.to_frame()
+            timings['ms'] = (timings['seconds'] * 1000).round(1)
+            timings['memory MiB'] = (timings['memory_delta_bytes'] / 2 ** 20).round(1)
+            st.sidebar.dataframe(timings[['stage', 'ms', 'rows', 'memory MiB']], hide_index=True,
+                                 use_container_width=True)
+            st.sidebar.download_button("Download Timings (JSON)", self.to_json(),
+                                       file_name=f"{self.page}-timings.json", mime='application/json')
+            # Progress of the background loading, with the next data version while it is being loaded
+            st.sidebar.caption("Background loading")
+            st.sidebar.dataframe(pd.DataFrame(data_access.get_warmup().status()), hide_index=True,
+                                 use_container_width=True)
+        if profile is not None:
+            text, dump = profile
+            with st.sidebar.expander("Profile Of This Interaction"):
+                st.code(text)
+            st.sidebar.download_button("Download Profile (.prof)", dump, file_name=f"{self.page}.prof")
+
+
+def start_page(page):
+    """
+    Start timing a rerun of ``page``, under cProfile when profiling was switched on in the previous rerun.
+    """
+
+    return PageTimer(page, profile=st.session_state.get(PROFILE_KEY, False))
@@ -0,0 +1,192 @@
+"""
+Embedded SQLite backend for the sender, time and reply aggregations.
+
+The processed emails (without their text) are kept in an indexed SQLite database, so the filter + aggregate queries
+of the Senders page and the per-sender summary behind ``grouped_emails.csv`` run in the database instead of over an
+in-memory frame.
+
+Usage: python -m enron.query_backend [data] [--summary grouped_emails.csv]
+"""
+import argparse
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from enron import storage, word_counts
+
+DATABASE_PATH = storage.artifact_path('emails.sqlite')
+
+COLUMNS = ['Message-ID', 'From', 'Date', 'Year', 'Month', 'Day', 'Hour', 'Is-Reply', 'Is-Forwarded', 'Word-Count']
+INDEXED_COLUMNS = ['From', 'Date', 'Year', 'Month', 'Day', 'Is-Reply', 'Is-Forwarded']
+
+SCHEMA = """
+CREATE TABLE emails (
+    "Message-ID" TEXT PRIMARY KEY,
+    "From" TEXT NOT NULL,
+    "Date" TEXT NOT NULL,
+    "Year" INTEGER NOT NULL,
+    "Month" TEXT NOT NULL,
+    "Day" TEXT NOT NULL,
+    "Hour" INTEGER NOT NULL,
+    "Is-Reply" INTEGER NOT NULL,
+    "Is-Forwarded" INTEGER NOT NULL,
+    "Word-Count" INTEGER NOT NULL
+)
+"""
+
+
+def to_rows(df, mode='nltk', workers=None):
+    """
+    Database rows of a cleaned emails DataFrame (Message-ID, From, Date, Year, Month, Day, Hour, the flags and
+    Content), with word counts in the given word count mode.
+    """
+
+    rows = pd.DataFrame({
+        'Message-ID': df['Message-ID'],
+        'From': df['From'].astype(str),
+        'Date': df['Date'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'Year': df['Year'].astype(int),
+        'Month': df['Month'].astype(str),
+        'Day': df['Day'].astype(str),
+        'Hour': df['Hour'].astype(int),
+        'Is-Reply': df['Is-Reply'].astype(int),
+        'Is-Forwarded': df['Is-Forwarded'].astype(int),
+        'Word-Count': word_counts.count_words(df['Content'], mode, workers),
+    })
+    return rows.itertuples(index=False, name=None)
+
+
+def insert_emails(conn, df, mode='nltk', workers=None):
+    placeholders = ', '.join('?' * len(COLUMNS))
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    conn.executemany(f'INSERT OR REPLACE INTO emails ({columns}) VALUES ({placeholders})', to_rows(df, mode, workers))
+
+
+def word_count_mode(path=DATABASE_PATH):
+    """
+    The word count mode the database was built with, None for databases built before the mode was recorded.
+    """
+
+    with closing(sqlite3.connect(path)) as conn:
+        try:
+            row = conn.execute("SELECT value FROM metadata WHERE key = 'word_count_mode'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return row[0] if row else None
+
+
+def update_database(chunks, removed_ids=(), path=DATABASE_PATH, mode='nltk', workers=None):
+    """
+    Apply an incremental ingest to an existing database: drop the rows of ``removed_ids`` and insert the new
+    cleaned chunks. The database must have been built in the same word count ``mode``.
+    """
+
+    built_mode = word_count_mode(path)
+    if built_mode != mode:
+        raise ValueError(f"{path} has {built_mode} word counts, cannot add {mode} word counts; rebuild it instead")
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executemany('DELETE FROM emails WHERE "Message-ID" = ?', ((message_id,) for message_id in removed_ids))
+        for chunk in chunks:
+            insert_emails(conn, chunk, mode, workers)
+        conn.commit()
+
+
+def build_database(data_dir=storage.DATA_DIR, path=None, batch_size=50000, mode='nltk', workers=None):
+    """
+    (Re)create the SQLite database of an ingested data directory, streaming the emails in batches.
+    """
+
+    path = path or storage.artifact_path('emails.sqlite', data_dir)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    dataset = ds.dataset(storage.artifact_path('emails', data_dir), format='parquet', partitioning='hive')
+    with closing(sqlite3.connect(tmp_path)) as conn:
+        conn.execute(SCHEMA)
+        conn.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        conn.execute("INSERT INTO metadata VALUES ('word_count_mode', ?)", (mode,))
+        columns = ['Message-ID', 'From', 'Date', 'Year', 'Month', 'Day', 'Hour', 'Is-Reply', 'Is-Forwarded', 'Content']
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            insert_emails(conn, batch.to_pandas(), mode, workers)
+        for column in INDEXED_COLUMNS:
+            conn.execute(f'CREATE INDEX "idx_{column}" ON emails ("{column}")')
+        conn.commit()
+    os.replace(tmp_path, path)
+    return EmailDatabase(path)
+
+
+def _where(filters, start=None, end=None):
+    clauses, params = [], []
+    for column, value in filters.items():
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column {column!r}")
+        clauses.append(f'"{column}" = ?')
+        params.append(value)
+    if start is not None:
+        clauses.append('"Date" >= ?')
+        params.append(str(pd.Timestamp(start)))
+    if end is not None:
+        clauses.append('"Date" < ?')
+        params.append(str(pd.Timestamp(end)))
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class EmailDatabase:
+    """
+    Read only queries against the emails database. Every query opens its own connection, so one instance can be
+    shared by all server threads.
+    """
+
+    def __init__(self, path=DATABASE_PATH):
+        self.path = path
+
+    def query(self, sql, params=()):
+        with closing(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def count_by(self, column, filters=None, start=None, end=None):
+        """
+        Number of emails per value of ``column`` among the emails matching ``filters`` (a {column: value} dict) and
+        dated in [start, end). Same shape as ``cube.counts_by``.
+        """
+
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column {column!r}")
+        where, params = _where(filters or {}, start, end)
+        counts = self.query(f'SELECT "{column}", COUNT(*) AS count FROM emails{where} '
+                            f'GROUP BY "{column}" ORDER BY "{column}"', params)
+        if column in ('Is-Reply', 'Is-Forwarded'):
+            counts[column] = counts[column].astype(bool)
+        return counts
+
+    def sender_summary(self, filters=None, start=None, end=None):
+        """
+        Emails sent, average word count and reply count per sender, the table saved as ``grouped_emails.csv``.
+        """
+
+        where, params = _where(filters or {}, start, end)
+        return self.query('SELECT "From", COUNT(*) AS Emails_Sent, AVG("Word-Count") AS Average_Word_Count, '
+                          f'SUM("Is-Reply") AS Reply_Count FROM emails{where} GROUP BY "From" ORDER BY "From"',
+                          params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the SQLite database of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    parser.add_argument('--summary', default=None, help="also write the per-sender summary to this CSV")
+    parser.add_argument('--word-count', choices=word_counts.MODES, default='nltk', help="word count mode")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes of the nltk mode")
+    args = parser.parse_args(argv)
+    with storage.rebuild_version(args.data_dir, rebuilt=['emails.sqlite']) as path:
+        database = build_database(path, mode=args.word_count, workers=args.workers)
+    if args.summary:
+        database.sender_summary().to_csv(args.summary, index=False)
+        print(f"Wrote the sender summary to {args.summary}")
+    print(f"Built {database.path}")
+
+
+if __name__ == '__main__':
+    main()
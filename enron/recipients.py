@@ -0,0 +1,71 @@
+"""
+Normalized message -> recipient table, built once at ingest so the pages never have to parse or explode the To
+lists themselves.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from enron import storage
+
+RECIPIENTS_PATH = storage.artifact_path('recipients')
+
+SCHEMA = pa.schema([
+    ('Message-ID', pa.string()),
+    ('From', pa.dictionary(pa.int32(), pa.string())),
+    ('To', pa.dictionary(pa.int32(), pa.string())),
+    ('Recipient-Count', pa.int16()),
+])
+
+
+def build_recipients(df):
+    """
+    Explode the To lists of a cleaned emails DataFrame into one (Message-ID, From, To) row per recipient.
+
+    Recipient-Count keeps the size of the original To list, so single recipient messages can be selected without
+    going back to the emails.
+    """
+
+    recipients = df[['Message-ID', 'From', 'To']].copy()
+    recipients['Recipient-Count'] = recipients['To'].map(len)
+    recipients = recipients.explode('To', ignore_index=True)
+    return recipients.dropna(subset=['To'])
+
+
+def append_recipients(df, chunk_id, path=RECIPIENTS_PATH):
+    """
+    Append the recipient rows of one cleaned chunk to the recipients table.
+    """
+
+    table = pa.Table.from_pandas(build_recipients(df), schema=SCHEMA, preserve_index=False)
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(table, os.path.join(path, f'part-{chunk_id:05d}.parquet'))
+
+
+def read_recipients(columns=None, filters=None, path=RECIPIENTS_PATH):
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def recipient_counts(recipients, message_ids):
+    """
+    Count how many of the given messages were sent to every recipient, most frequent first.
+    """
+
+    selected = recipients.loc[recipients['Message-ID'].isin(message_ids), 'To']
+    counts = selected.value_counts(sort=True)
+    counts = counts[counts > 0]
+    return pd.DataFrame({'To': counts.index.astype(str), 'count': counts.to_numpy()})
+
+
+def edge_counts(recipients):
+    """
+    Count the messages sent between every (From, To) pair, using only messages that had a single recipient.
+    """
+
+    single = recipients.loc[recipients['Recipient-Count'] == 1, ['From', 'To']]
+    edges = single.groupby(['From', 'To'], observed=True).size().reset_index(name='count')
+    edges['From'] = edges['From'].astype(str)
+    edges['To'] = edges['To'].astype(str)
+    return edges.sort_values('count', ascending=False).reset_index(drop=True)
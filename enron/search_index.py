@@ -0,0 +1,374 @@
+"""
+Positional inverted index over the Content, Subject and Forward-Content of every message, for the Search page.
+
+Text is split into lower case alphanumeric tokens. For every field and token the index keeps a posting list of the
+messages holding it with the token positions, so phrases can be matched. Posting lists are delta encoded and stored
+as variable length integers (7 bits per byte), and the index is made of segments that each cover a batch of
+messages. Ingest writes one segment per ``segment_size`` messages, an incremental ingest adds a segment for the new
+messages and marks the old rows of changed messages as deleted.
+
+Queries support bare terms, "quoted phrases", ``field:`` prefixes (content, subject, forward), exclusion with ``-``
+or NOT, and OR between groups of terms that all have to match::
+
+    "gas prices" california -subject:fw OR forward:enron
+
+Usage: python -m enron.search_index [data] [--query QUERY]
+"""
+import argparse
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from enron import storage
+
+SEARCH_PATH = storage.artifact_path('search')
+FIELDS = {'content': 'Content', 'subject': 'Subject', 'forward': 'Forward-Content'}
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+QUERY_RE = re.compile(r'(-?)(?:([a-z]+):)?(?:"([^"]*)"|(\S+))')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if isinstance(text, str) else []
+
+
+def encode_varints(values):
+    """
+    Encode non-negative integers as little endian base 128 varints into one uint8 array.
+
+    Returns the bytes and the number of bytes used by every value.
+    """
+
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= np.uint64(1 << shift)
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max(initial=0))):
+        has_byte = lengths > k
+        byte = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[has_byte] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has_byte] + k] = byte | more
+    return out, lengths
+
+
+def decode_varints(data):
+    """
+    Decode a uint8 array of varints written by ``encode_varints``.
+    """
+
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.r_[0, ends[:-1] + 1]
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 7 * (np.arange(len(data)) - starts[group])
+    payload = (data & 0x7f).astype(np.int64) << shifts
+    return np.add.reduceat(payload, starts)
+
+
+class Postings:
+    """
+    Decoded posting list of one term: the documents holding it and, per occurrence, its document and position.
+    """
+
+    def __init__(self, docs, freqs, positions):
+        self.docs = docs
+        self.occurrence_docs = np.repeat(docs, freqs)
+        self.positions = positions
+
+    def keys(self, offset=0):
+        """
+        (document, position - offset) of every occurrence packed into one integer, for phrase matching.
+        """
+
+        return (self.occurrence_docs << 32) + (self.positions - offset)
+
+
+EMPTY_POSTINGS = Postings(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+
+class Segment:
+    """
+    Inverted index of one batch of messages. Documents are the row positions of ``message_ids``.
+    """
+
+    def __init__(self, message_ids, fields, deleted=None, path=None):
+        self.message_ids = np.asarray(message_ids, dtype=object)
+        # field -> (terms Index, offsets, lengths, doc_freqs, postings bytes)
+        self.fields = fields
+        self.live = np.ones(len(self.message_ids), dtype=bool)
+        if deleted is not None:
+            self.live[deleted] = False
+        self.path = path
+
+    def postings(self, field, term):
+        terms, offsets, lengths, doc_freqs, data = self.fields[field]
+        i = terms.get_indexer([term])[0]
+        if i < 0:
+            return EMPTY_POSTINGS
+        values = decode_varints(data[offsets[i]:offsets[i] + lengths[i]])
+        n = doc_freqs[i]
+        docs = np.cumsum(values[:n])
+        freqs = values[n:2 * n]
+        deltas = values[2 * n:]
+        # Positions restart from zero in every document
+        cumulative = np.cumsum(deltas)
+        first = np.cumsum(freqs) - freqs
+        positions = cumulative - np.repeat(cumulative[first] - deltas[first], freqs)
+        return Postings(docs, freqs, positions)
+
+    def phrase_docs(self, field, tokens):
+        keys = self.postings(field, tokens[0]).keys()
+        for offset, token in enumerate(tokens[1:], start=1):
+            if not len(keys):
+                break
+            keys = np.intersect1d(keys, self.postings(field, token).keys(offset), assume_unique=True)
+        return np.unique(keys >> 32)
+
+    def docs(self, fields, tokens):
+        """
+        Documents holding the term (one token) or the phrase (several tokens) in any of ``fields``.
+        """
+
+        matches = [self.postings(field, tokens[0]).docs if len(tokens) == 1 else self.phrase_docs(field, tokens)
+                   for field in fields]
+        return np.unique(np.concatenate(matches)) if matches else np.zeros(0, dtype=np.int64)
+
+    def search(self, clauses):
+        found = []
+        for clause in clauses:
+            include = [self.docs(fields, tokens) for negated, fields, tokens in clause if not negated]
+            exclude = [self.docs(fields, tokens) for negated, fields, tokens in clause if negated]
+            docs = np.flatnonzero(self.live) if not include else include[0]
+            for other in include[1:]:
+                docs = np.intersect1d(docs, other, assume_unique=True)
+            for other in exclude:
+                docs = np.setdiff1d(docs, other, assume_unique=True)
+            found.append(docs)
+        docs = np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+        return self.message_ids[docs[self.live[docs]]]
+
+    def delete(self, message_ids):
+        """
+        Mark the rows of the given messages as deleted and return how many were found.
+        """
+
+        rows = np.flatnonzero(pd.Index(self.message_ids).isin(message_ids) & self.live)
+        self.live[rows] = False
+        if len(rows) and self.path is not None:
+            np.save(os.path.join(self.path, 'deleted.npy'), np.flatnonzero(~self.live))
+        return len(rows)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        pd.DataFrame({'Message-ID': self.message_ids}).to_parquet(os.path.join(path, 'messages.parquet'))
+        np.save(os.path.join(path, 'deleted.npy'), np.flatnonzero(~self.live))
+        for field, (terms, offsets, lengths, doc_freqs, data) in self.fields.items():
+            pd.DataFrame({'Term': terms, 'Offset': offsets, 'Length': lengths, 'Doc-Freq': doc_freqs}).to_parquet(
+                os.path.join(path, f'{field}.terms.parquet'))
+            np.save(os.path.join(path, f'{field}.postings.npy'), np.asarray(data))
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        message_ids = pd.read_parquet(os.path.join(path, 'messages.parquet'))['Message-ID'].to_numpy()
+        fields = {}
+        for field in FIELDS:
+            terms = pd.read_parquet(os.path.join(path, f'{field}.terms.parquet'))
+            # Posting bytes are memory mapped, only the lists a query touches are read
+            data = np.load(os.path.join(path, f'{field}.postings.npy'), mmap_mode='r')
+            fields[field] = (pd.Index(terms['Term']), terms['Offset'].to_numpy(), terms['Length'].to_numpy(),
+                             terms['Doc-Freq'].to_numpy(), data)
+        return cls(message_ids, fields, np.load(os.path.join(path, 'deleted.npy')), path)
+
+
+class SegmentBuilder:
+    """
+    Collects the token positions of messages batch by batch and encodes them into a ``Segment``.
+    """
+
+    def __init__(self):
+        self.message_ids = []
+        self.term_ids = {}
+        self.occurrences = {field: [] for field in FIELDS}
+
+    def __len__(self):
+        return len(self.message_ids)
+
+    def add(self, df):
+        """
+        Index a DataFrame with Message-ID, Content, Subject and Forward-Content columns.
+        """
+
+        first_doc = len(self.message_ids)
+        self.message_ids.extend(df['Message-ID'])
+        for field, column in FIELDS.items():
+            tokens = [tokenize(text) for text in df[column]]
+            lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+            codes, uniques = pd.factorize([token for doc_tokens in tokens for token in doc_tokens])
+            term_ids = np.array([self.term_ids.setdefault(term, len(self.term_ids)) for term in uniques],
+                                dtype=np.int64)
+            docs = np.repeat(np.arange(first_doc, first_doc + len(tokens)), lengths)
+            positions = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            self.occurrences[field].append((term_ids[codes] if len(codes) else codes.astype(np.int64), docs,
+                                            positions))
+
+    def _encode(self, occurrences, vocabulary):
+        terms = np.concatenate([o[0] for o in occurrences]) if occurrences else np.zeros(0, dtype=np.int64)
+        docs = np.concatenate([o[1] for o in occurrences]) if occurrences else np.zeros(0, dtype=np.int64)
+        positions = np.concatenate([o[2] for o in occurrences]) if occurrences else np.zeros(0, dtype=np.int64)
+        order = np.lexsort((positions, docs, terms))
+        terms, docs, positions = terms[order], docs[order], positions[order]
+
+        new_pair = np.r_[True, (terms[1:] != terms[:-1]) | (docs[1:] != docs[:-1])] if len(terms) else \
+            np.zeros(0, dtype=bool)
+        pairs = np.flatnonzero(new_pair)
+        pair_terms, pair_docs = terms[pairs], docs[pairs]
+        freqs = np.diff(np.r_[pairs, len(terms)])
+        new_term = np.r_[True, pair_terms[1:] != pair_terms[:-1]] if len(pairs) else np.zeros(0, dtype=bool)
+        doc_deltas = np.where(new_term, pair_docs, pair_docs - np.r_[0, pair_docs[:-1]])
+        position_deltas = np.where(new_pair, positions, positions - np.r_[0, positions[:-1]])
+
+        # Every posting list is its doc deltas, then its frequencies, then its position deltas
+        values = np.concatenate([doc_deltas, freqs, position_deltas])
+        owners = np.concatenate([pair_terms, pair_terms, terms])
+        sections = np.repeat([0, 1, 2], [len(doc_deltas), len(freqs), len(position_deltas)])
+        order = np.lexsort((sections, owners))
+        data, lengths = encode_varints(values[order])
+
+        n_terms = len(vocabulary)
+        byte_lengths = np.bincount(owners[order], weights=lengths, minlength=n_terms).astype(np.int64)
+        doc_freqs = np.bincount(pair_terms, minlength=n_terms)
+        offsets = np.cumsum(byte_lengths) - byte_lengths
+        present = doc_freqs > 0
+        return pd.Index(vocabulary[present]), offsets[present], byte_lengths[present], doc_freqs[present], data
+
+    def build(self):
+        vocabulary = np.empty(len(self.term_ids), dtype=object)
+        for term, term_id in self.term_ids.items():
+            vocabulary[term_id] = term
+        fields = {field: self._encode(self.occurrences[field], vocabulary) for field in FIELDS}
+        return Segment(self.message_ids, fields)
+
+
+def parse_query(query):
+    """
+    Parse a query into OR-ed clauses, each a list of (negated, fields, tokens) items that all have to match.
+    """
+
+    clauses, clause, negate_next = [], [], False
+    for negated, field, phrase, word in QUERY_RE.findall(query):
+        if not phrase and word in ('OR', 'NOT') and not negated and not field:
+            if word == 'OR':
+                if clause:
+                    clauses.append(clause)
+                clause = []
+            else:
+                negate_next = True
+            continue
+        if field and field not in FIELDS:
+            # Not a field prefix, e.g. a time like 10:30
+            word = f'{field}:{word}' if word else phrase
+            field = ''
+        tokens = tokenize(phrase if phrase else word)
+        if tokens:
+            clause.append((bool(negated) or negate_next, [field] if field else list(FIELDS), tokens))
+        negate_next = False
+    if clause:
+        clauses.append(clause)
+    return clauses
+
+
+class SearchIndex:
+    """
+    All segments of the search index, searched together.
+    """
+
+    def __init__(self, segments=(), path=SEARCH_PATH):
+        self.segments = list(segments)
+        self.path = path
+
+    def search(self, query):
+        """
+        Message-IDs of the messages matching ``query``, as an array.
+        """
+
+        clauses = parse_query(query)
+        if not clauses:
+            return np.zeros(0, dtype=object)
+        found = [segment.search(clauses) for segment in self.segments]
+        return np.concatenate(found) if found else np.zeros(0, dtype=object)
+
+    def add(self, df):
+        """
+        Index new messages as a new segment, saved next to the existing ones.
+        """
+
+        builder = SegmentBuilder()
+        builder.add(df)
+        self._append(builder.build())
+
+    def _append(self, segment):
+        segment.save(os.path.join(self.path, f'segment-{len(self.segments):05d}'))
+        self.segments.append(segment)
+
+    def delete(self, message_ids):
+        return sum(segment.delete(message_ids) for segment in self.segments)
+
+    @classmethod
+    def load(cls, path=SEARCH_PATH):
+        names = sorted(name for name in os.listdir(path) if name.startswith('segment-'))
+        return cls([Segment.load(os.path.join(path, name)) for name in names], path)
+
+
+def build_search_index(data_dir=storage.DATA_DIR, batch_size=10000, segment_size=100000):
+    """
+    Build the search index of an ingested data directory, streaming the emails in batches and writing a segment
+    for every ``segment_size`` messages.
+    """
+
+    path = storage.artifact_path('search', data_dir)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    index = SearchIndex(path=path)
+    dataset = ds.dataset(storage.artifact_path('emails', data_dir), format='parquet', partitioning='hive')
+    builder = SegmentBuilder()
+    columns = ['Message-ID'] + list(FIELDS.values())
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        builder.add(batch.to_pandas())
+        if len(builder) >= segment_size:
+            index._append(builder.build())
+            builder = SegmentBuilder()
+    if len(builder):
+        index._append(builder.build())
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the search index of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    parser.add_argument('--query', default=None, help="search the existing index instead of rebuilding it")
+    args = parser.parse_args(argv)
+    if args.query is not None:
+        index = SearchIndex.load(storage.artifact_path('search', storage.current_path(args.data_dir)))
+        message_ids = index.search(args.query)
+        print(f"{len(message_ids)} matching emails")
+        for message_id in message_ids[:20]:
+            print(message_id)
+        return
+    with storage.rebuild_version(args.data_dir, rebuilt=['search']) as path:
+        index = build_search_index(path)
+    print(f"Indexed {sum(len(segment.message_ids) for segment in index.segments)} emails in "
+          f"{len(index.segments)} segments")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Per-sender summary behind the More Plots page: emails sent, average word count and reply count.
+
+The summary is kept as running totals per sender (emails, words and replies), so adding mail only sums the totals of
+the new messages into the rows of their senders instead of recounting every message. ``to_grouped`` turns the totals
+into the ``grouped_emails.csv`` table of the notebook. The word count mode is saved in the Parquet metadata, so
+totals counted in another mode are never added to them.
+
+Usage: python -m enron.sender_summary [data] [--mode regex] [--csv grouped_emails.csv]
+"""
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from enron import storage, word_counts
+
+SUMMARY_PATH = storage.artifact_path('senders.parquet')
+TOTALS = ['Emails_Sent', 'Word_Total', 'Reply_Count']
+
+SCHEMA = pa.schema([
+    ('From', pa.string()),
+    ('Emails_Sent', pa.int64()),
+    ('Word_Total', pa.int64()),
+    ('Reply_Count', pa.int64()),
+])
+MODE_KEY = b'word_count_mode'
+
+
+def build_summary(df, mode='nltk', workers=None):
+    """
+    Totals per sender of a cleaned emails DataFrame, with word counts computed in the given word count mode.
+    """
+
+    totals = pd.DataFrame({
+        'From': df['From'].astype(str).to_numpy(),
+        'Emails_Sent': 1,
+        'Word_Total': word_counts.count_words(df['Content'], mode, workers),
+        'Reply_Count': df['Is-Reply'].astype(int).to_numpy(),
+    })
+    return totals.groupby('From', as_index=False)[TOTALS].sum()
+
+
+def merge_summaries(*summaries):
+    """
+    Add up sender totals, e.g. the running summary and the totals of a batch of new messages.
+    """
+
+    summaries = [summary for summary in summaries if summary is not None and not summary.empty]
+    if not summaries:
+        return pd.DataFrame(columns=['From'] + TOTALS)
+    merged = pd.concat(summaries, ignore_index=True)
+    return merged.groupby('From', as_index=False)[TOTALS].sum()
+
+
+def update_summary(summary, df, mode='nltk', workers=None):
+    """
+    The summary after adding the messages of ``df``; only the senders of those messages change.
+    """
+
+    return merge_summaries(summary, build_summary(df, mode, workers))
+
+
+def to_grouped(summary):
+    """
+    The ``grouped_emails.csv`` table: From, Emails_Sent, Average_Word_Count and Reply_Count.
+    """
+
+    return pd.DataFrame({
+        'From': summary['From'],
+        'Emails_Sent': summary['Emails_Sent'],
+        'Average_Word_Count': summary['Word_Total'] / summary['Emails_Sent'],
+        'Reply_Count': summary['Reply_Count'],
+    })
+
+
+def write_summary(summary, path=SUMMARY_PATH, mode='nltk'):
+    schema = SCHEMA.with_metadata({MODE_KEY: mode.encode()})
+    pq.write_table(pa.Table.from_pandas(summary, schema=schema, preserve_index=False), path)
+
+
+def read_summary(path=SUMMARY_PATH):
+    return pd.read_parquet(path)
+
+
+def summary_mode(path=SUMMARY_PATH):
+    """
+    The word count mode of a saved summary, None for summaries written before the mode was recorded.
+    """
+
+    metadata = pq.read_schema(path).metadata or {}
+    mode = metadata.get(MODE_KEY)
+    return mode.decode() if mode is not None else None
+
+
+def build_sender_summary(data_dir=storage.DATA_DIR, mode='nltk', workers=None, batch_size=50000):
+    """
+    Rebuild the sender summary of an ingested data directory from its emails data set, one batch at a time.
+    """
+
+    dataset = ds.dataset(storage.artifact_path('emails', data_dir), format='parquet', partitioning='hive')
+    summary = None
+    for batch in dataset.to_batches(columns=['From', 'Content', 'Is-Reply'], batch_size=batch_size):
+        summary = update_summary(summary, batch.to_pandas(), mode, workers)
+    summary = merge_summaries(summary)
+    write_summary(summary, storage.artifact_path('senders.parquet', data_dir), mode)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the per-sender summary of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    parser.add_argument('--mode', choices=word_counts.MODES, default='nltk', help="word count mode")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes of the nltk mode")
+    parser.add_argument('--csv', default=None, help="also write the summary as grouped_emails.csv to this path")
+    args = parser.parse_args(argv)
+    with storage.rebuild_version(args.data_dir, rebuilt=['senders.parquet']) as path:
+        summary = build_sender_summary(path, args.mode, args.workers)
+    if args.csv:
+        to_grouped(summary).to_csv(args.csv, index=False)
+        print(f"Wrote the sender summary to {args.csv}")
+    print(f"Summarized {summary['Emails_Sent'].sum()} emails from {len(summary)} senders")
+
+
+if __name__ == '__main__':
+    main()
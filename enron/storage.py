@@ -0,0 +1,320 @@
+"""
+Columnar storage of the cleaned emails as a partitioned Parquet data set.
+
+Every ingest writes a new version of the data set and its derived artifacts into a directory of its own,
+``data/versions/<version>``, and publishes it by rewriting ``data/VERSION`` once everything is written. A published
+version directory is never changed, so readers of one version never see files of another: the command line tools
+that rebuild a single artifact write it into a new version as well (``rebuild_version``).
+"""
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from enron.dates import MONTHS
+
+DATA_DIR = 'data'
+
+
+def artifact_path(name, data_dir=DATA_DIR):
+    """
+    Location of a derived artifact (data set, table, index) inside a data directory.
+    """
+
+    return os.path.join(data_dir, name)
+
+
+EMAILS_PATH = artifact_path('emails')
+VERSION_PATH = artifact_path('VERSION')
+VERSIONS_DIR = 'versions'
+
+# Artifacts whose files are only ever added, replaced or deleted, never rewritten in place, so a new version can
+# share them with the previous one through hard links
+LINKED_ARTIFACTS = ('emails', 'recipients')
+# Top level entries of a data directory that are not part of a version
+UNVERSIONED = (VERSIONS_DIR, 'VERSION', 'VERSION.tmp', 'figures')
+# Everything an ingest writes into a version, also the top level entries of data directories written before
+# versions had directories of their own
+VERSIONED_ARTIFACTS = ('emails', 'recipients', 'cube.parquet', 'senders.parquet', 'graph', 'centrality.parquet',
+                       'terms', 'search', 'threads', 'emails.sqlite', 'fingerprints.parquet')
+PARTITION_COLUMNS = ['Year', 'Month']
+
+# Low cardinality strings are dictionary encoded so they load as pandas categoricals
+SCHEMA = pa.schema([
+    ('Message-ID', pa.string()),
+    ('From', pa.dictionary(pa.int32(), pa.string())),
+    ('To', pa.list_(pa.string())),
+    ('Subject', pa.string()),
+    ('Date', pa.timestamp('ns')),
+    ('Cc', pa.string()),
+    ('Bcc', pa.string()),
+    ('X-From', pa.string()),
+    ('X-To', pa.string()),
+    ('Content', pa.string()),
+    ('Folder-Name', pa.dictionary(pa.int32(), pa.string())),
+    ('Is-Forwarded', pa.bool_()),
+    ('Forward-Content', pa.string()),
+    ('Year', pa.int16()),
+    ('Month', pa.dictionary(pa.int8(), pa.string())),
+    ('Day', pa.dictionary(pa.int8(), pa.string())),
+    ('Hour', pa.int8()),
+    ('Is-Reply', pa.bool_()),
+])
+
+
+def to_table(df):
+    """
+    Convert a cleaned emails DataFrame into an Arrow table with the typed data set schema.
+    """
+
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def reset_dataset(path=EMAILS_PATH):
+    """
+    Remove a previously written data set so a full ingest starts from scratch.
+    """
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+
+def append_chunk(df, chunk_id, path=EMAILS_PATH):
+    """
+    Append one cleaned chunk to the Parquet data set, partitioned by year and month.
+    """
+
+    pq.write_to_dataset(to_table(df), path, partition_cols=PARTITION_COLUMNS,
+                        basename_template=f'part-{chunk_id:05d}-{{i}}.parquet',
+                        existing_data_behavior='overwrite_or_ignore')
+
+
+def read_emails(columns=None, filters=None, path=EMAILS_PATH):
+    """
+    Load the emails data set, reading only the requested ``columns`` and the partitions matching ``filters``.
+    """
+
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def list_partitions(path=EMAILS_PATH):
+    """
+    The (year, month) partitions of the data set in chronological order.
+    """
+
+    partitions = []
+    if not os.path.isdir(path):
+        return partitions
+    for year_dir in os.listdir(path):
+        if not year_dir.startswith('Year='):
+            continue
+        for month_dir in os.listdir(os.path.join(path, year_dir)):
+            if month_dir.startswith('Month='):
+                partitions.append((int(year_dir[len('Year='):]), month_dir[len('Month='):]))
+    return sorted(partitions, key=lambda partition: (partition[0], MONTHS.index(partition[1])))
+
+
+def partition_path(partition, path=EMAILS_PATH):
+    """
+    Directory holding one (year, month) partition of the data set.
+    """
+
+    year, month = partition
+    return os.path.join(path, f'Year={year}', f'Month={month}')
+
+
+def read_partition(partition, columns, path=EMAILS_PATH):
+    """
+    Read the given columns of a single (year, month) partition as an Arrow table.
+    """
+
+    file_columns = [column for column in columns if column not in PARTITION_COLUMNS]
+    table = pq.read_table(partition_path(partition, path), columns=file_columns, partitioning=None)
+    year, month = partition
+    if 'Year' in columns:
+        table = table.append_column('Year', pa.array([year] * table.num_rows, type=pa.int16()))
+    if 'Month' in columns:
+        codes = pa.array([MONTHS.index(month)] * table.num_rows, type=pa.int8())
+        months = pa.DictionaryArray.from_arrays(codes, pa.array(MONTHS))
+        table = table.append_column('Month', months)
+    return table.select(columns)
+
+
+def dataset_files(path=EMAILS_PATH):
+    """
+    Every Parquet file of a data set directory, in a stable order.
+    """
+
+    files = []
+    for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names if name.endswith('.parquet'))
+    return sorted(files)
+
+
+def next_chunk_id(path=EMAILS_PATH):
+    """
+    The first chunk id not used by the ``part-<chunk id>...`` files of a data set, so appended chunks never
+    overwrite earlier ones.
+    """
+
+    chunk_ids = [int(os.path.basename(file).split('-')[1].split('.')[0]) for file in dataset_files(path)]
+    return max(chunk_ids, default=-1) + 1
+
+
+def _partition_values(file):
+    values = {}
+    for part in os.path.dirname(file).split(os.sep):
+        key, sep, value = part.partition('=')
+        if sep and key in PARTITION_COLUMNS:
+            values[key] = int(value) if key == 'Year' else value
+    return values
+
+
+def remove_messages(message_ids, files):
+    """
+    Remove the rows of the given messages from a set of data set files and return the removed rows.
+
+    Only files holding at least one of the messages are rewritten (or deleted once empty). Partition columns of the
+    removed rows are restored from the file paths.
+    """
+
+    message_ids = pa.array(list(message_ids), type=pa.string())
+    removed = []
+    for file in files:
+        ids = pq.read_table(file, columns=['Message-ID'], partitioning=None)['Message-ID']
+        if not pc.any(pc.is_in(ids, value_set=message_ids)).as_py():
+            continue
+        table = pq.read_table(file, partitioning=None)
+        mask = pc.is_in(table['Message-ID'], value_set=message_ids)
+        rows = table.filter(mask).to_pandas()
+        for key, value in _partition_values(file).items():
+            rows[key] = value
+        removed.append(rows)
+        kept = table.filter(pc.invert(mask))
+        if kept.num_rows:
+            pq.write_table(kept, file + '.tmp')
+            os.replace(file + '.tmp', file)
+        else:
+            os.remove(file)
+    return pd.concat(removed, ignore_index=True) if removed else pd.DataFrame()
+
+
+def write_version(data_dir=DATA_DIR, version=None):
+    """
+    Publish ``version`` (a new version stamp when None) as the current version of a data directory, called after
+    its artifacts were (re)written.
+    """
+
+    version = version or str(time.time_ns())
+    tmp_path = artifact_path('VERSION.tmp', data_dir)
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, artifact_path('VERSION', data_dir))
+    return version
+
+
+def data_version(data_dir=DATA_DIR):
+    """
+    Version stamp of a data directory, used to key caches of anything derived from it.
+    """
+
+    try:
+        with open(artifact_path('VERSION', data_dir)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def version_path(version, data_dir=DATA_DIR):
+    """
+    Directory holding the artifacts of a data version. Data directories written before versions had directories of
+    their own keep their artifacts at the top level.
+    """
+
+    if version is not None:
+        path = os.path.join(data_dir, VERSIONS_DIR, version)
+        if os.path.isdir(path):
+            return path
+    return data_dir
+
+
+def current_path(data_dir=DATA_DIR):
+    """
+    Directory holding the artifacts of the current version of a data directory.
+    """
+
+    return version_path(data_version(data_dir), data_dir)
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def new_version(data_dir=DATA_DIR, base=None, exclude=()):
+    """
+    Create the directory of an unpublished data version and return the version and the directory.
+
+    With ``base``, the directory of an earlier version, the new one starts as a copy of it to be updated in place:
+    the files of ``LINKED_ARTIFACTS`` are hard linked and every other artifact but the ``exclude`` ones is copied.
+    """
+
+    version = str(time.time_ns())
+    path = os.path.join(data_dir, VERSIONS_DIR, version)
+    if base is None:
+        os.makedirs(path)
+        return version, path
+
+    def copy(source, target):
+        artifact = os.path.relpath(source, base).split(os.sep)[0]
+        (_link_or_copy if artifact in LINKED_ARTIFACTS else shutil.copy2)(source, target)
+
+    def ignore(directory, names):
+        return [name for name in names if name in UNVERSIONED or name in exclude] if directory == base else []
+
+    shutil.copytree(base, path, ignore=ignore, copy_function=copy)
+    return version, path
+
+
+@contextmanager
+def rebuild_version(data_dir=DATA_DIR, rebuilt=()):
+    """
+    A new version of a data directory, started from its current version without the ``rebuilt`` artifacts, for the
+    ``with`` block to write them into. It is published when the block completes and removed when it fails.
+    """
+
+    version, path = new_version(data_dir, base=current_path(data_dir), exclude=rebuilt)
+    try:
+        yield path
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    write_version(data_dir, version)
+
+
+def prune_versions(oldest, data_dir=DATA_DIR):
+    """
+    Remove the version directories older than version ``oldest``, and the top level artifacts of the layout from
+    before version directories. Newer versions, published or still being written by an ingest, are kept.
+    """
+
+    versions_path = os.path.join(data_dir, VERSIONS_DIR)
+    if oldest is None or not os.path.isdir(os.path.join(versions_path, oldest)):
+        # The oldest version in use is still read from the top level
+        return
+    for name in os.listdir(versions_path):
+        if name.isdigit() and int(name) < int(oldest):
+            shutil.rmtree(os.path.join(versions_path, name), ignore_errors=True)
+    for name in VERSIONED_ARTIFACTS:
+        path = artifact_path(name, data_dir)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,139 @@
+"""
+Synthetic Enron-shaped ``emails.csv`` files for benchmarks and tests.
+
+Messages follow the layout of the real corpus (file, message columns with the same headers) with a skewed sender
+distribution, internal and external addresses, single, multi and broadcast recipients, replies, forwards and a small
+share of the malformed years and missing recipients the ingest has to cope with.
+
+Usage: python -m enron.synthetic emails.csv --messages 100000 [--seed 0]
+"""
+import argparse
+import string
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from enron.ingest import FORWARD_SEPARATOR
+
+EXTERNAL_DOMAINS = ['aol.com', 'yahoo.com', 'hotmail.com', 'dynegy.com', 'elpaso.com', 'caiso.com']
+COMMON_WORDS = ['the', 'to', 'and', 'of', 'a', 'in', 'for', 'is', 'on', 'that', 'we', 'this', 'with', 'you', 'be',
+                'will', 'have', 'are', 'it', 'at', 'please', 'thanks', 'gas', 'power', 'price', 'energy', 'market',
+                'deal', 'contract', 'meeting', 'california', 'trading', 'report', 'schedule', 'agreement', 'credit',
+                'attached', 'call', 'questions', 'review', "don't", "we'll", 'capacity', 'transmission', 'pipeline']
+SUBJECTS = ['Meeting', 'Gas prices', 'Power schedule', 'Contract review', 'Credit report', 'Trading update',
+            'California update', 'Deal sheet', 'Lunch', 'Agreement draft', 'Pipeline capacity', 'Weekly report']
+TIMEZONES = [('-0800', 'PST'), ('-0700', 'PDT'), ('-0500', 'CDT'), ('+0000', 'GMT')]
+START = datetime(1999, 1, 1)
+SPAN_SECONDS = int((datetime(2002, 7, 1) - START).total_seconds())
+
+
+def _vocabulary(rng, size=3000):
+    syllables = [a + b for a in 'bcdfghklmnprstvw' for b in 'aeiou']
+    words = {''.join(rng.choice(syllables, size=rng.integers(2, 4))) for _ in range(size)}
+    return np.array(COMMON_WORDS + sorted(words), dtype=object)
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _people(rng, n_people):
+    names = [''.join(rng.choice(list(string.ascii_lowercase), size=6)) for _ in range(n_people)]
+    external = rng.random(n_people) < 0.2
+    domains = rng.choice(EXTERNAL_DOMAINS, size=n_people)
+    return np.array([f'{name}.{i}@{domain if is_external else "enron.com"}'
+                     for i, (name, is_external, domain) in enumerate(zip(names, external, domains))], dtype=object)
+
+
+def _text(rng, vocabulary, weights, n_words):
+    words = rng.choice(vocabulary, size=n_words, p=weights)
+    lines = [' '.join(words[i:i + 12]) for i in range(0, n_words, 12)]
+    return '.\n'.join(lines) + '.'
+
+
+def generate(n_messages, seed=0, first_id=0, n_people=None):
+    """
+    A DataFrame of ``n_messages`` raw messages with the file and message columns of the Enron ``emails.csv``.
+
+    The address book has ``n_people`` addresses (one per 200 messages by default) and is the same for every seed.
+    """
+
+    rng = np.random.default_rng(seed)
+    vocabulary = _vocabulary(np.random.default_rng(0))
+    word_weights = _zipf_weights(len(vocabulary))
+    people = _people(np.random.default_rng(1), n_people or max(50, n_messages // 200))
+    sender_weights = _zipf_weights(len(people))
+
+    senders = rng.choice(len(people), size=n_messages, p=sender_weights)
+    n_recipients = rng.choice([0, 1, 2, 3, 5, 25], size=n_messages, p=[0.02, 0.6, 0.15, 0.12, 0.08, 0.03])
+    seconds = rng.integers(0, SPAN_SECONDS, size=n_messages)
+    timezones = rng.integers(0, len(TIMEZONES), size=n_messages)
+    bad_years = rng.random(n_messages) < 0.001
+    subjects = rng.integers(0, len(SUBJECTS), size=n_messages)
+    prefixes = rng.choice(['', 'Re: ', 'RE: ', 'FW: '], size=n_messages, p=[0.6, 0.2, 0.1, 0.1])
+    body_lengths = rng.integers(5, 200, size=n_messages)
+    forwarded = rng.random(n_messages) < 0.15
+
+    files, messages = [], []
+    for i in range(n_messages):
+        sender = people[senders[i]]
+        recipients = people[rng.choice(len(people), size=n_recipients[i], replace=False)]
+        date = START + timedelta(seconds=int(seconds[i]))
+        offset, zone = TIMEZONES[timezones[i]]
+        date_header = date.strftime('%a, %d %b %Y %H:%M:%S')
+        # Only the 2000-2002 years have the zero padded variant the ingest fixes up
+        if bad_years[i] and date.year >= 2000:
+            date_header = date_header.replace(str(date.year), f'000{date.year % 10}')
+        body = _text(rng, vocabulary, word_weights, body_lengths[i])
+        if forwarded[i]:
+            body += (f'\n\n{FORWARD_SEPARATOR}Forwarded by {people[senders[i - 1]]} on {date:%m/%d/%Y %I:%M %p} '
+                     f'---------------------------\n\n{_text(rng, vocabulary, word_weights, 40)}')
+        user = sender.split('@')[0]
+        to = ', '.join(recipients)
+        messages.append(
+            f"Message-ID: <{first_id + i}.{seed}.JavaMail.evans@thyme>\n"
+            f"Date: {date_header} {offset} ({zone})\n"
+            f"From: {sender}\n"
+            f"{'To: ' + to + chr(10) if to else ''}"
+            f"Subject: {prefixes[i]}{SUBJECTS[subjects[i]]}\n"
+            "Mime-Version: 1.0\n"
+            "Content-Type: text/plain; charset=us-ascii\n"
+            "Content-Transfer-Encoding: 7bit\n"
+            f"X-From: {user}\n"
+            f"X-To: {to}\n"
+            "X-cc: \n"
+            "X-bcc: \n"
+            f"X-Folder: \\{user}\\sent_mail\n"
+            f"X-Origin: {user}\n"
+            f"X-FileName: {user}.nsf\n"
+            f"\n{body}")
+        files.append(f'{user}/sent_mail/{first_id + i}.')
+    return pd.DataFrame({'file': files, 'message': messages})
+
+
+def write_csv(path, n_messages, seed=0, chunksize=50000):
+    """
+    Write a synthetic ``emails.csv`` of ``n_messages`` messages, generated ``chunksize`` messages at a time.
+    """
+
+    n_people = max(50, n_messages // 200)
+    for i, first_id in enumerate(range(0, n_messages, chunksize)):
+        chunk = generate(min(chunksize, n_messages - first_id), seed + i, first_id, n_people)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Enron-shaped emails.csv.")
+    parser.add_argument('output')
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csv(args.output, args.messages, args.seed)
+    print(f"Wrote {args.messages} messages to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Term frequency index of the cleaned email contents and subjects.
+
+Every message gets a row in two sparse (CSR) count matrices, one per field, over a shared vocabulary of cleaned
+tokens. Word clouds for any subset of messages are then a row subset sum.
+
+Usage: python -m enron.term_index [data]  (rebuilds the index of an ingested data directory)
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from scipy import sparse
+
+from enron import storage, text_cleaning
+
+TERM_INDEX_PATH = storage.artifact_path('terms')
+FIELDS = {'content': 'Content', 'subject': 'Subject'}
+
+
+class TermIndex:
+    """
+    Per-message token counts of every field, aligned with ``message_ids``.
+    """
+
+    def __init__(self, vocabulary, message_ids, matrices):
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.message_ids = pd.Index(message_ids)
+        self.matrices = matrices
+        self._totals = {}
+
+    def rows_for(self, message_ids):
+        """
+        Row positions of the given messages, skipping messages that are not indexed.
+        """
+
+        rows = self.message_ids.get_indexer(message_ids)
+        return rows[rows >= 0]
+
+    def counts(self, field, rows=None):
+        """
+        Total count of every vocabulary term in ``field`` over ``rows`` (all messages when None).
+        """
+
+        matrix = self.matrices[field]
+        if rows is None:
+            if field not in self._totals:
+                self._totals[field] = np.asarray(matrix.sum(axis=0)).ravel()
+            return self._totals[field]
+        return np.asarray(matrix[rows].sum(axis=0)).ravel()
+
+    def top_terms(self, field, rows=None, n=200, exclude=()):
+        """
+        The ``n`` most frequent terms of ``field`` over ``rows`` as a {term: count} dict, ready for
+        ``WordCloud.generate_from_frequencies``.
+        """
+
+        counts = self.counts(field, rows)
+        if exclude:
+            counts = counts.copy()
+            counts[np.isin(self.vocabulary, list(exclude))] = 0
+        top = np.argsort(counts)[::-1][:n]
+        top = top[counts[top] > 0]
+        return dict(zip(self.vocabulary[top], counts[top].tolist()))
+
+    def without(self, message_ids):
+        """
+        A copy of the index without the rows of the given messages.
+        """
+
+        keep = ~self.message_ids.isin(message_ids)
+        matrices = {field: matrix[keep] for field, matrix in self.matrices.items()}
+        return TermIndex(self.vocabulary, self.message_ids[keep], matrices)
+
+    def save(self, path=TERM_INDEX_PATH):
+        os.makedirs(path, exist_ok=True)
+        pd.DataFrame({'Term': self.vocabulary}).to_parquet(os.path.join(path, 'vocabulary.parquet'))
+        pd.DataFrame({'Message-ID': self.message_ids}).to_parquet(os.path.join(path, 'messages.parquet'))
+        for field, matrix in self.matrices.items():
+            sparse.save_npz(os.path.join(path, f'{field}.npz'), matrix)
+
+    @classmethod
+    def load(cls, path=TERM_INDEX_PATH):
+        vocabulary = pd.read_parquet(os.path.join(path, 'vocabulary.parquet'))['Term'].to_numpy()
+        message_ids = pd.read_parquet(os.path.join(path, 'messages.parquet'))['Message-ID']
+        matrices = {field: sparse.load_npz(os.path.join(path, f'{field}.npz')).tocsr() for field in FIELDS}
+        return cls(vocabulary, message_ids, matrices)
+
+
+class TermIndexBuilder:
+    """
+    Builds a ``TermIndex`` chunk by chunk, growing the shared vocabulary as new terms show up.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.term_ids = {}
+        self.message_ids = []
+        self.blocks = {field: [] for field in FIELDS}
+
+    @classmethod
+    def from_index(cls, index, workers=None):
+        """
+        A builder that extends an existing index, e.g. with newly ingested messages.
+        """
+
+        builder = cls(workers)
+        builder.term_ids = {term: i for i, term in enumerate(index.vocabulary)}
+        builder.message_ids = list(index.message_ids)
+        builder.blocks = {field: [index.matrices[field]] for field in FIELDS}
+        return builder
+
+    def _count_matrix(self, cleaned_texts):
+        rows, cols = [], []
+        for row, text in enumerate(cleaned_texts):
+            ids = [self.term_ids.setdefault(token, len(self.term_ids)) for token in text.split()]
+            rows.extend([row] * len(ids))
+            cols.extend(ids)
+        data = np.ones(len(cols), dtype=np.int32)
+        # Duplicate (row, term) pairs are summed into counts by the conversion to CSR
+        return sparse.coo_matrix((data, (rows, cols)), shape=(len(cleaned_texts), len(self.term_ids))).tocsr()
+
+    def add(self, df):
+        """
+        Index a DataFrame with Message-ID, Content and Subject columns.
+        """
+
+        self.message_ids.extend(df['Message-ID'])
+        for field, column in FIELDS.items():
+            cleaned = text_cleaning.clean_texts(df[column].fillna(''), self.workers)
+            self.blocks[field].append(self._count_matrix(cleaned))
+
+    def build(self):
+        n_terms = len(self.term_ids)
+        vocabulary = np.empty(n_terms, dtype=object)
+        for term, term_id in self.term_ids.items():
+            vocabulary[term_id] = term
+
+        matrices = {}
+        for field, blocks in self.blocks.items():
+            # Earlier blocks were built against a smaller vocabulary, widen them before stacking
+            blocks = [sparse.csr_matrix((b.data, b.indices, b.indptr), shape=(b.shape[0], n_terms)) for b in blocks]
+            matrices[field] = sparse.vstack(blocks, format='csr') if blocks else sparse.csr_matrix((0, n_terms))
+        return TermIndex(vocabulary, self.message_ids, matrices)
+
+
+def build_term_index(data_dir=storage.DATA_DIR, batch_size=50000, workers=None):
+    """
+    Build and save the term index of an ingested data directory, streaming the emails in batches.
+    """
+
+    dataset = ds.dataset(storage.artifact_path('emails', data_dir), format='parquet', partitioning='hive')
+    builder = TermIndexBuilder(workers)
+    for batch in dataset.to_batches(columns=['Message-ID', 'Content', 'Subject'], batch_size=batch_size):
+        builder.add(batch.to_pandas())
+    index = builder.build()
+    index.save(storage.artifact_path('terms', data_dir))
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the term frequency index of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    args = parser.parse_args(argv)
+    with storage.rebuild_version(args.data_dir, rebuilt=['terms']) as path:
+        index = build_term_index(path)
+    print(f"Indexed {len(index.message_ids)} emails, {len(index.vocabulary)} terms")
+
+
+if __name__ == '__main__':
+    main()
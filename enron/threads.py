@@ -0,0 +1,219 @@
+"""
+Conversation threading of the emails, with reply latency, thread depth and who-answers-whom statistics.
+
+Messages are grouped by their normalized subject (``Re:``/``Fw:`` prefixes and whitespace stripped, case folded)
+through a hash of it, and ordered by date within a subject. A message joins the latest conversation of its subject
+its sender took part in, as sender or recipient, unless that conversation has been quiet for longer than
+``max_gap``; otherwise it starts a new one. Its parent is the latest earlier message of the conversation sent to it by
+someone else, so a reply is only counted when the sender had actually been written to. Every message is visited once
+and looked up in per-subject participant dicts, which keeps threading linear in the number of recipients.
+
+The statistics are written at ingest as four tables in the ``threads`` directory of the data version: ``messages``
+(thread, parent, depth and reply latency of every message), ``threads`` (per conversation), ``senders`` (per
+sender) and ``edges`` (replier -> the sender they answered). The pages only read them.
+
+Usage: python -m enron.threads [data] [--max-gap-days 14]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from enron import storage
+
+THREADS_PATH = storage.artifact_path('threads')
+TABLES = ('messages', 'threads', 'senders', 'edges')
+MAX_GAP = pd.Timedelta(days=14)
+
+# Any run of reply and forward prefixes, e.g. "RE: Fw: re[2]: "
+PREFIX_PATTERN = r'^(?:\s*(?:re|fw|fwd)\s*(?:\[\d+\])?\s*:)+'
+
+
+def normalize_subjects(subjects):
+    """
+    Subjects without their reply and forward prefixes, lower cased and with collapsed whitespace.
+    """
+
+    normalized = subjects.fillna('').astype(str).str.lower()
+    normalized = normalized.str.replace(PREFIX_PATTERN, '', regex=True)
+    return normalized.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+class _Thread:
+    __slots__ = ('id', 'last', 'addressed')
+
+    def __init__(self, thread_id):
+        self.id = thread_id
+        self.last = None
+        # Participant -> position of the latest message of the thread sent to them
+        self.addressed = {}
+
+
+def assign_threads(df, max_gap=MAX_GAP):
+    """
+    Thread, parent, depth and reply latency of every message of a DataFrame with Message-ID, From, To, Subject and
+    Date columns, in the order of ``df``.
+
+    Messages with an empty subject or without a date each form a thread of their own.
+    """
+
+    n = len(df)
+    subjects = normalize_subjects(df['Subject'])
+    subject_codes, _ = pd.factorize(subjects)
+    dates = pd.to_datetime(df['Date']).to_numpy()
+    undated = np.isnat(dates)
+    # Singletons get a subject code of their own so they never meet another message
+    alone = (subjects == '').to_numpy() | undated
+    subject_codes = np.where(alone, subject_codes.max(initial=0) + 1 + np.arange(n), subject_codes)
+    order = np.lexsort((dates.view('i8'), subject_codes))
+
+    senders = df['From'].astype(str).to_numpy()
+    recipients = df['To'].to_numpy()
+    gap = np.timedelta64(max_gap.value, 'ns')
+    thread_ids = np.empty(n, dtype=np.int64)
+    parents = np.full(n, -1, dtype=np.int64)
+    depths = np.zeros(n, dtype=np.int16)
+
+    next_thread = 0
+    current_subject = None
+    latest = {}
+    for position in order:
+        if subject_codes[position] != current_subject:
+            current_subject = subject_codes[position]
+            latest = {}
+        sender = senders[position]
+        date = dates[position]
+        thread = latest.get(sender)
+        if thread is None or date - dates[thread.last] > gap:
+            thread = _Thread(next_thread)
+            next_thread += 1
+        parent = thread.addressed.get(sender, -1)
+        if parent >= 0 and senders[parent] != sender:
+            parents[position] = parent
+            depths[position] = depths[parent] + 1
+        thread_ids[position] = thread.id
+        thread.last = position
+        latest[sender] = thread
+        to = recipients[position]
+        if to is not None:
+            for recipient in to:
+                thread.addressed[recipient] = position
+                latest[recipient] = thread
+
+    message_ids = df['Message-ID'].to_numpy()
+    has_parent = parents >= 0
+    latency = np.full(n, np.nan)
+    latency[has_parent] = (dates[has_parent] - dates[parents[has_parent]]) / np.timedelta64(1, 's')
+    return pd.DataFrame({
+        'Message-ID': message_ids,
+        'Thread-ID': thread_ids,
+        'Parent-ID': np.where(has_parent, message_ids[np.maximum(parents, 0)], None),
+        'From': senders,
+        'Replied-To': np.where(has_parent, senders[np.maximum(parents, 0)], None),
+        'Subject': subjects.to_numpy(),
+        'Date': dates,
+        'Depth': depths,
+        'Latency_Seconds': latency,
+    })
+
+
+def thread_stats(messages):
+    """
+    Per conversation: normalized subject, message and participant counts, depth, time span and median reply latency.
+    """
+
+    grouped = messages.groupby('Thread-ID')
+    threads = grouped.agg(Subject=('Subject', 'first'), Messages=('Message-ID', 'size'), Senders=('From', 'nunique'),
+                          Replies=('Parent-ID', 'count'), Depth=('Depth', 'max'), Start=('Date', 'min'),
+                          End=('Date', 'max'), Median_Latency_Seconds=('Latency_Seconds', 'median'))
+    threads['Duration_Seconds'] = (threads['End'] - threads['Start']).dt.total_seconds()
+    return threads.reset_index()
+
+
+def sender_stats(messages):
+    """
+    Per sender: conversations started and taken part in, replies sent and received and their latencies.
+    """
+
+    replies = messages.dropna(subset=['Parent-ID'])
+    # A message without a parent opens the sender's part of the conversation
+    senders = messages.assign(Opened=messages['Parent-ID'].isna()).groupby('From').agg(
+        Emails_Sent=('Message-ID', 'size'), Threads=('Thread-ID', 'nunique'), Threads_Started=('Opened', 'sum'))
+    latency = replies.groupby('From')['Latency_Seconds']
+    senders['Replies_Sent'] = latency.size()
+    senders['Median_Latency_Seconds'] = latency.median()
+    senders['Mean_Latency_Seconds'] = latency.mean()
+    senders['Replies_Received'] = replies.groupby('Replied-To').size()
+    senders[['Replies_Sent', 'Replies_Received']] = senders[['Replies_Sent', 'Replies_Received']].fillna(0)
+    senders = senders.astype({'Replies_Sent': 'int64', 'Replies_Received': 'int64'})
+    return senders.rename_axis('From').reset_index()
+
+
+def reply_edges(messages):
+    """
+    Who answers whom: one row per replier (From) and the sender they answered (To), with the reply count and latency.
+    """
+
+    replies = messages.dropna(subset=['Parent-ID']).rename(columns={'Replied-To': 'To'})
+    edges = replies.groupby(['From', 'To'])['Latency_Seconds'].agg(['size', 'median'])
+    edges.columns = ['count', 'Median_Latency_Seconds']
+    return edges.reset_index().sort_values('count', ascending=False, kind='stable', ignore_index=True)
+
+
+def compute_threads(df, max_gap=MAX_GAP):
+    """
+    All four thread tables of an emails DataFrame, keyed by table name.
+    """
+
+    messages = assign_threads(df, max_gap)
+    return {
+        'messages': messages[['Message-ID', 'Thread-ID', 'Parent-ID', 'Depth', 'Latency_Seconds']],
+        'threads': thread_stats(messages),
+        'senders': sender_stats(messages),
+        'edges': reply_edges(messages),
+    }
+
+
+def write_threads(tables, path=THREADS_PATH):
+    os.makedirs(path, exist_ok=True)
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(path, f'{name}.parquet'), index=False)
+
+
+def read_threads(table, columns=None, path=THREADS_PATH):
+    """
+    One of the thread tables ('messages', 'threads', 'senders' or 'edges').
+    """
+
+    return pd.read_parquet(os.path.join(path, f'{table}.parquet'), columns=columns)
+
+
+def build_threads(data_dir=storage.DATA_DIR, max_gap=MAX_GAP):
+    """
+    Thread the whole data set of an ingested data directory and save the thread tables.
+    """
+
+    df = storage.read_emails(columns=['Message-ID', 'From', 'To', 'Subject', 'Date'],
+                             path=storage.artifact_path('emails', data_dir))
+    tables = compute_threads(df, max_gap)
+    write_threads(tables, storage.artifact_path('threads', data_dir))
+    return tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thread the emails of an ingested data directory.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    parser.add_argument('--max-gap-days', type=float, default=MAX_GAP.days,
+                        help="quiet days after which a message starts a new conversation")
+    args = parser.parse_args(argv)
+    with storage.rebuild_version(args.data_dir, rebuilt=['threads']) as path:
+        tables = build_threads(path, pd.Timedelta(days=args.max_gap_days))
+    threads = tables['threads']
+    print(f"{len(tables['messages'])} messages in {len(threads)} conversations, "
+          f"{(threads['Messages'] > 1).sum()} with more than one message, deepest {threads['Depth'].max()} replies")
+    print(tables['senders'].nlargest(10, 'Replies_Sent').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
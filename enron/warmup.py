@@ -0,0 +1,222 @@
+"""
+Background loading of the dashboard artifacts.
+
+A ``WarmupService`` loads every artifact on a thread pool as soon as it is started, so the first page view does not
+pay for all of them one after the other, and then runs the warmers: derived results (the default data set columns,
+the network layout) computed from the loaded artifacts ahead of the first request for them.
+
+The artifacts of one data version form a generation, loaded from the version's own directory (see ``storage``),
+which no ingest writes to once it is published. Pages read from the current generation and block only on the
+artifacts they need; while the first generation is loading, every artifact is available as soon as it is loaded. A
+background thread watches ``storage.data_version`` and, when an ingest publishes a new version, loads a new
+generation next to the current one and swaps it in once it is complete. A page run takes the current generation
+once and reads every artifact and the version from it, so a swap in the middle of a run never mixes two versions.
+After a swap, the replaced generation is closed and the directories of versions older than it are handed to
+``retire``. A version that fails to load is closed and not tried again until a newer one is published.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from enron import storage
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class Generation:
+    """
+    The artifacts of one data version, as futures of their loads.
+    """
+
+    def __init__(self, version, path):
+        self.version = version
+        self.path = path
+        self.futures = {}
+        self.states = {}
+        self.seconds = {}
+        self.complete = threading.Event()
+
+    def failed(self):
+        return [name for name, state in self.states.items() if state == FAILED]
+
+    def close(self):
+        """
+        Release the loaded artifacts that hold resources (threads, caches) through their ``close`` method.
+        """
+
+        for name, future in self.futures.items():
+            if future.done() and future.exception() is None:
+                close = getattr(future.result(), 'close', None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception:
+                        logger.exception("Closing %s failed", name)
+
+    def get(self, name):
+        """
+        The artifact ``name``, waiting for its load. Raises the error of a failed load.
+        """
+
+        return self.futures[name].result()
+
+    def ready(self, names=None):
+        return all(self.futures[name].done() for name in (names or self.futures))
+
+    def progress(self, names=None):
+        """
+        The number of the ``names`` (all loaders by default) that are loaded or failed, and the ones still loading.
+        """
+
+        names = list(names or self.futures)
+        loading = [name for name in names if not self.futures[name].done()]
+        return len(names) - len(loading), loading
+
+
+class WarmupService:
+    """
+    Loads ``loaders`` (name -> function of the version directory returning the artifact) with ``workers`` threads,
+    then runs ``warmers`` (name -> function of a dict of the loaded artifacts) and checks for a new data version
+    every ``poll_seconds``. ``locate`` maps a version to its directory and ``retire`` is called with the oldest
+    version still in use once a generation is loaded.
+    """
+
+    def __init__(self, loaders, warmers=None, version=storage.data_version, locate=storage.version_path,
+                 retire=None, workers=4, poll_seconds=10):
+        self.loaders = loaders
+        self.warmers = warmers or {}
+        self.version = version
+        self.locate = locate
+        self.retire = retire
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self.pending = None
+        self.failed_version = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warmup')
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self.current is not None:
+                return self
+            self.current = self._load(self.version(), swap=False)
+        if self.poll_seconds:
+            threading.Thread(target=self._poll, name='warmup-poll', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, generation, name, fn, *args):
+        generation.states[name] = RUNNING
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            generation.states[name] = FAILED
+            logger.exception("Loading %s failed", name)
+            raise
+        finally:
+            generation.seconds[name] = time.perf_counter() - start
+        generation.states[name] = READY
+        return result
+
+    def _load(self, version, swap):
+        generation = Generation(version, self.locate(version))
+        for name in list(self.loaders) + list(self.warmers):
+            generation.states[name] = PENDING
+        for name, loader in self.loaders.items():
+            generation.futures[name] = self._executor.submit(self._run, generation, name, loader, generation.path)
+        threading.Thread(target=self._finish, args=(generation, swap), name='warmup-finish', daemon=True).start()
+        return generation
+
+    def _finish(self, generation, swap):
+        wait(generation.futures.values())
+        artifacts = {name: future.result() for name, future in generation.futures.items()
+                     if future.exception() is None}
+        warmers = [self._executor.submit(self._run, generation, name, warmer, artifacts)
+                   for name, warmer in self.warmers.items()]
+        wait(warmers)
+        generation.complete.set()
+        if not swap:
+            self._retire(generation.version)
+            return
+        with self._lock:
+            previous = self.current
+            if generation.failed():
+                # Keep serving the previous version until a newer one is published
+                logger.warning("Data version %s not swapped in, failed: %s", generation.version,
+                               ', '.join(generation.failed()))
+                self.failed_version = generation.version
+            else:
+                self.current = generation
+            self.pending = None
+        if self.current is not generation:
+            generation.close()
+            return
+        # Reruns that started before the swap may still read the previous version: closing only releases its
+        # threads and caches, and its directory is kept until the next swap
+        previous.close()
+        self._retire(previous.version)
+
+    def _retire(self, oldest):
+        if self.retire is None:
+            return
+        try:
+            self.retire(oldest)
+        except Exception:
+            logger.exception("Removing data versions older than %s failed", oldest)
+
+    def _poll(self):
+        while not self._stopped.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Checking the data version failed")
+
+    def refresh(self):
+        """
+        Start loading a new generation if the data version changed and none is loading yet.
+        """
+
+        version = self.version()
+        with self._lock:
+            if version in (self.current.version, self.failed_version) or self.pending is not None:
+                return self.pending
+            self.pending = self._load(version, swap=True)
+            return self.pending
+
+    def get(self, name):
+        """
+        The artifact ``name`` of the current generation, waiting for its load. Raises the error of a failed load.
+        """
+
+        return self.current.get(name)
+
+    def ready(self, names=None):
+        return self.current.ready(names)
+
+    def progress(self, names=None):
+        return self.current.progress(names)
+
+    def status(self):
+        """
+        State and load time of every loader and warmer of the current generation, and of the one being loaded.
+        """
+
+        rows = []
+        for generation in (self.current, self.pending):
+            if generation is None:
+                continue
+            for name, state in generation.states.items():
+                rows.append({'version': generation.version, 'artifact': name, 'state': state,
+                             'seconds': generation.seconds.get(name)})
+        return rows
@@ -0,0 +1,128 @@
+"""
+Word counts of the message bodies, the ``Average_Word_Count`` of ``grouped_emails.csv``.
+
+Two modes are available:
+
+- ``nltk`` gives exactly the counts of ``len(word_tokenize(content))``, with the messages spread in batches over a
+  pool of worker processes.
+- ``regex`` counts the matches of one compiled pattern that splits text the way the Treebank tokenizer does (words,
+  contractions, numbers and punctuation marks). It runs in the calling process and is much faster, at the price of
+  a few differences around abbreviations and sentence boundaries.
+
+Usage: python -m enron.word_counts [data] [--sample 2000] compares both modes with the original method.
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from enron import process_pool, storage
+
+MODES = ('nltk', 'regex')
+
+# One match per Treebank token: ellipses and dashes, split off contractions, words (keeping inner dots, inner
+# apostrophes and digit separators) and every other punctuation mark on its own
+TOKEN_RE = re.compile(r"""
+    \.\.\.|--
+  | (?i:n't|'(?:s|m|d|ll|re|ve))(?![^\W_])
+  | [^\W_]+(?=(?i:n't)(?![^\W_]))
+  | [^\s.,;:!?"'`()\[\]{}<>@#$%&]+(?:(?:\.|(?<=\d)[,:](?=\d)|'(?!(?i:s|m|d|ll|re|ve|t)(?![^\W_])))
+                                      [^\s.,;:!?"'`()\[\]{}<>@#$%&]+)*
+  | [^\w\s]
+""", re.VERBOSE)
+
+
+def regex_count(content):
+    return sum(1 for _ in TOKEN_RE.finditer(content)) if isinstance(content, str) else 0
+
+
+def nltk_count(content):
+    from nltk import word_tokenize
+    return len(word_tokenize(content)) if isinstance(content, str) else 0
+
+
+def _nltk_batch(texts):
+    return [nltk_count(content) for content in texts]
+
+
+def count_words(texts, mode='nltk', workers=None, batch_size=5000):
+    """
+    Word count of every text as an int32 array.
+
+    In ``nltk`` mode, inputs larger than one batch are tokenized in batches of ``batch_size`` texts over a pool of
+    worker processes, created once and reused by later calls. ``workers=1`` keeps the work in the calling process.
+    """
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown word count mode {mode!r}, expected one of {MODES}")
+    texts = list(texts)
+    if mode == 'regex':
+        return np.fromiter(map(regex_count, texts), dtype=np.int32, count=len(texts))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) <= batch_size:
+        return np.array(_nltk_batch(texts), dtype=np.int32)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    counts = []
+    for batch in process_pool.get_pool(workers).map(_nltk_batch, batches):
+        counts.extend(batch)
+    return np.array(counts, dtype=np.int32)
+
+
+def compare(df, workers=None):
+    """
+    Compare both modes with the original one-message-at-a-time ``word_tokenize`` count on the ``From`` and
+    ``Content`` columns of ``df``.
+
+    Returns the timing of every method, how many message counts differ from the original and by how much, and the
+    largest relative difference it makes in a sender's average word count.
+    """
+
+    contents = df['Content'].tolist()
+    start = time.perf_counter()
+    original = np.array([nltk_count(content) for content in contents], dtype=np.int32)
+    timings = {'original': time.perf_counter() - start}
+    report = {'messages': len(contents), 'seconds': timings}
+    for mode in MODES:
+        start = time.perf_counter()
+        counts = count_words(contents, mode, workers)
+        timings[mode] = time.perf_counter() - start
+        difference = np.abs(counts.astype(np.int64) - original)
+        averages = pd.DataFrame({'From': df['From'].astype(str).to_numpy(), 'original': original, 'mode': counts})
+        averages = averages.groupby('From')[['original', 'mode']].mean()
+        relative = (averages['mode'] - averages['original']).abs() / averages['original'].clip(lower=1)
+        report[mode] = {
+            'mismatches': int((difference > 0).sum()),
+            'mean_abs_difference': float(difference.mean()) if len(contents) else 0.0,
+            'max_sender_average_relative_difference': float(relative.max()) if len(relative) else 0.0,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the word count modes with the original word_tokenize "
+                                                 "count.")
+    parser.add_argument('data_dir', nargs='?', default=storage.DATA_DIR)
+    parser.add_argument('--sample', type=int, default=2000, help="messages to compare (0 for all)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes of the nltk mode")
+    args = parser.parse_args(argv)
+
+    df = storage.read_emails(columns=['From', 'Content'],
+                             path=storage.artifact_path('emails', storage.current_path(args.data_dir)))
+    if args.sample and args.sample < len(df):
+        df = df.sample(args.sample, random_state=0)
+    report = compare(df, args.workers)
+    print(f"Compared {report['messages']} messages")
+    print(f"  original: {report['seconds']['original']:.2f}s")
+    for mode in MODES:
+        result = report[mode]
+        print(f"  {mode}: {report['seconds'][mode]:.2f}s, {result['mismatches']} mismatches, "
+              f"mean difference {result['mean_abs_difference']:.2f} words, largest change of a sender average "
+              f"{result['max_sender_average_relative_difference']:.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,55 @@
-import re
-import string
-
-import pandas as pd
 import streamlit as st
 from matplotlib import pyplot as plt
-from nltk import WordNetLemmatizer
-from nltk.corpus import stopwords
-from wordcloud import WordCloud
+from wordcloud import STOPWORDS, WordCloud
+
+from enron import cube, data_access, profiling
 
 
 def show_used_words():
     """
     Generate word clouds to visualize the most commonly used words in the email content and subjects.
 
-    The function performs data cleaning, including removing stop words, lemmatizing words, and removing punctuation
-    and non-alphabetic characters. It then generates word clouds based on the cleaned content and subjects.
+    The word counts come from the term index built at ingest (stop words removed, words lemmatized, punctuation and
+    non-alphabetic characters dropped), summed over the filtered messages.
 
     """
 
-    # Function for cleaning text data
-    def text_cleaning(txt):
-        stop_words = set(stopwords.words('english'))
-        stop_words.update(
-            ('from', 'to', 'cc', 'http', 're', 'www', 'com', 'subject', 'sent', 'email', 'u', 'ok',
-             'thanks', 'please', 'ect', 'dt', 'pm', 'enron'))
-        exclude = set(string.punctuation)
-        lemma = WordNetLemmatizer()
-        txt = txt.rstrip()
-        txt = re.sub(r'[^a-zA-Z]', ' ', txt)
-        stop_free = " ".join(
-            [i for i in txt.lower().split() if ((i not in stop_words) and (not i.isdigit()) and len(i) > 3)])
-        punc_free = ''.join(ch for ch in stop_free if ch not in exclude)
-        return " ".join(lemma.lemmatize(word) for word in punc_free.split())
-
-    filter_df[['Content', 'Subject']] = filter_df[['Content', 'Subject']].fillna('')
-    text_clean = []
-    for text in filter_df['Content']:
-        text_clean.append(text_cleaning(text))
-    subject_clean = []
-    for sub_text in filter_df['Subject']:
-        subject_clean.append(text_cleaning(sub_text))
-
-    filter_df['Clean-Content'] = text_clean
-    filter_df['Clean-Subject'] = subject_clean
-
-    clean_content_text = ' '.join(text_clean)
-    wordcloud_content = WordCloud(width=800, height=400, background_color='white', max_words=200).generate(
-        clean_content_text)
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud_content, interpolation='bilinear')
-    plt.axis('off')
-    plt.title('Common Mail Words', fontsize=20, fontweight='bold')
-    st.pyplot(plt)
+    data_access.require('term index', generation=generation)
+    with perf.stage('term counts') as stage:
+        index = data_access.get_term_index(generation)
+        rows = index.rows_for(filter_df['Message-ID'])
+        content_counts = index.top_terms('content', rows, n=200, exclude=STOPWORDS)
+        subject_counts = index.top_terms('subject', rows, n=200, exclude=STOPWORDS)
+        stage['rows'] = len(rows)
+
+    with perf.stage('content word cloud'):
+        wordcloud_content = WordCloud(width=800, height=400, background_color='white', max_words=200)
+        wordcloud_content.generate_from_frequencies(content_counts)
+        plt.figure(figsize=(10, 5))
+        plt.imshow(wordcloud_content, interpolation='bilinear')
+        plt.axis('off')
+        plt.title('Common Mail Words', fontsize=20, fontweight='bold')
+        st.pyplot(plt)
 
     # Word cloud for Clean-Subject
-    clean_subject_text = ' '.join(subject_clean)
-    wordcloud_subject = WordCloud(width=800, height=400, background_color='white', max_words=200).generate(
-        clean_subject_text)
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud_subject, interpolation='bilinear')
-    plt.axis('off')
-    plt.title('Common Subject Words', fontsize=20, fontweight='bold')
-    st.pyplot(plt)
+    with perf.stage('subject word cloud'):
+        wordcloud_subject = WordCloud(width=800, height=400, background_color='white', max_words=200)
+        wordcloud_subject.generate_from_frequencies(subject_counts)
+        plt.figure(figsize=(10, 5))
+        plt.imshow(wordcloud_subject, interpolation='bilinear')
+        plt.axis('off')
+        plt.title('Common Subject Words', fontsize=20, fontweight='bold')
+        st.pyplot(plt)
 
 
 st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+perf = profiling.start_page("words")
+generation = data_access.get_generation()
 
-
-@st.cache_data
-def get_data():
-    return pd.read_csv('modified_emails.csv')
-
-
-df = get_data()
-part_df = df.sample(n=2000, random_state=42).reset_index()
-part_df[['Content', 'Subject']] = part_df[['Content', 'Subject']].fillna('')
+# The sidebar options come from the count cube, the messages are only loaded for the selected year and month
+with perf.stage('load cube'):
+    data_access.require('cube', generation=generation)
+    cube_df = data_access.get_cube(generation)
 
 # Adding Some filters on the sidebar for the data
 st.sidebar.header("Filter Here:")
@@ -90,34 +65,42 @@ month_dict = {"January": 1, "February": 2, "March": 3, "April": 4, "May": 5, "Ju
 
 day_dict = {"Sunday": 1, "Monday": 2, "Tuesday": 3, "Wednesday": 4, "Thursday": 5, "Friday": 6, "Saturday": 7}
 
-months = df["Month"].unique()
+years = [int(year) for year in cube.counts_by(cube_df, "Year")["Year"]]
+
+months = cube.counts_by(cube_df, "Month")["Month"]
 months_sorted = sorted(months, key=lambda x: month_dict.get(x))
 
-days = df["Day"].unique()
+days = cube.counts_by(cube_df, "Day")["Day"]
 days_sorted = sorted(days, key=lambda x: day_dict.get(x))
 
+selected_year = st.sidebar.selectbox("Select Year:", ["All"] + years)
 selected_month = st.sidebar.selectbox("Select Month:", ["All"] + list(months_sorted))
 selected_day = st.sidebar.selectbox("Select Day:", ["All"] + list(days_sorted))
 
-senders = df['From'].value_counts().nlargest(10).index.tolist()
+senders = cube.counts_by(cube_df, 'From').nlargest(10, 'count')['From'].tolist()
 selected_sender = st.sidebar.selectbox("Select Sender Mail:", ["All"] + senders)
 
-filter_df = part_df
+data_access.require('dataset', generation=generation)
+with perf.stage('load emails') as stage:
+    filter_df = data_access.get_emails(['Message-ID', 'From', 'Year', 'Month', 'Day', 'Is-Reply', 'Is-Forwarded'],
+                                       years=None if selected_year == "All" else [selected_year],
+                                       months=None if selected_month == "All" else [selected_month],
+                                       generation=generation)
+    stage['rows'] = len(filter_df)
 
-if selected_month != "All":
-    filter_df = filter_df[filter_df["Month"] == selected_month]
+with perf.stage('filter masks') as stage:
+    if selected_day != "All":
+        filter_df = filter_df[filter_df["Day"] == selected_day]
 
-if selected_day != "All":
-    filter_df = filter_df[filter_df["Day"] == selected_day]
+    if is_reply != "All":
+        filter_df = filter_df[filter_df["Is-Reply"] == is_reply]
 
-if is_reply != "All":
-    filter_df = filter_df[filter_df["Is-Reply"] == is_reply]
+    if is_forward != "All":
+        filter_df = filter_df[filter_df["Is-Forwarded"] == is_forward]
 
-if is_forward != "All":
-    filter_df = filter_df[filter_df["Is-Forwarded"] == is_forward]
-
-if selected_sender != "All":
-    filter_df = filter_df[filter_df["From"] == selected_sender]
+    if selected_sender != "All":
+        filter_df = filter_df[filter_df["From"] == selected_sender]
+    stage['rows'] = len(filter_df)
 
 st.title(":bar_chart: Words Data")
 st.markdown("##")
@@ -132,7 +115,7 @@ if total_emails != 0:
     l_col, m_col, r_col = st.columns(3)
     # Will have 3 KPIs - Total Emails, Total Distinct Senders, Most Prolific Emailer
     with l_col:
-        st.subheader("Total Emails: (Filtered Randomly For Speed)")
+        st.subheader("Total Emails: ")
         st.subheader(total_emails)
     with m_col:
         st.subheader("Total Distinct Senders: ")
@@ -146,3 +129,5 @@ if total_emails != 0:
     show_used_words()
 else:
     st.warning("Data Set Is Empty After Filtering")
+
+perf.show()
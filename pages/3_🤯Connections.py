@@ -1,58 +1,62 @@
-import ast
 import networkx as nx
 import numpy as np
-import pandas as pd
 import streamlit as st
 from matplotlib import pyplot as plt
 
+from enron import data_access, graph_store, profiling
+
 
 def network_plot(graph_to_plot):
     plt.figure(figsize=(20, 20))
-    pos = nx.spring_layout(graph_to_plot, k=0.5)
-    closeness = nx.closeness_centrality(graph_to_plot)
+    with perf.stage('top network layout') as stage:
+        pos = layouts.layout(graph_to_plot, k=0.5)
+        stage['rows'] = graph_to_plot.number_of_nodes()
+    # Closeness over the whole company graph, precomputed at ingest
+    closeness = metrics.loc[list(graph_to_plot.nodes), 'Closeness']
     # Compute edge widths based on 'count' attribute
     edge_widths = [d['count'] for (_, _, d) in graph_to_plot.edges(data=True)]
     max_edge = max(edge_widths)
     edge_widths_normalized = np.power(edge_widths, 0.5) / np.power(max_edge, 0.5) * 4
 
-    nx.draw_networkx_nodes(graph_to_plot, pos, node_size=25, node_color=list(closeness.values()))
-    nx.draw_networkx_edges(graph_to_plot, pos, edge_color='black', alpha=0.3, width=edge_widths_normalized)
-    nx.draw_networkx_labels(graph_to_plot, pos, font_size=10, font_color='black')
+    with perf.stage('top network drawing'):
+        nx.draw_networkx_nodes(graph_to_plot, pos, node_size=25, node_color=closeness.tolist())
+        nx.draw_networkx_edges(graph_to_plot, pos, edge_color='black', alpha=0.3, width=edge_widths_normalized)
+        nx.draw_networkx_labels(graph_to_plot, pos, font_size=10, font_color='black')
 
-    plt.title("Connections Between Top 100 Most Connected Workers", fontsize=20, fontweight='bold', alpha=1)
-    st.pyplot(plt)
+        plt.title("Connections Between Top 100 Most Connected Workers", fontsize=20, fontweight='bold', alpha=1)
+        st.pyplot(plt)
 
 
-def random_network_plot():
-    # Select a random subset of 1 percent nodes from sub_df_for_graph
-    random_subset = sub_df_for_graph.sample(frac=0.01, random_state=0)
-    random_nodes = np.unique(random_subset[['From', 'To']].values)
-    sub_df_random = sub_df_for_graph[
-        sub_df_for_graph['From'].isin(random_nodes) & sub_df_for_graph['To'].isin(random_nodes)]
+def random_network_plot(frac):
+    # Select the connections between the workers of a random subset of the edges
+    with perf.stage('random edges') as stage:
+        sub_df_random = store.random_edges(frac=frac, seed=0)
+        stage['rows'] = len(sub_df_random)
 
-    g2 = nx.from_pandas_edgelist(sub_df_random, source='From', target='To', edge_attr='count')
+    g2 = graph_store.to_networkx(sub_df_random)
     plt.figure(figsize=(20, 20))
-    pos = nx.spring_layout(g2, k=0.2)
+    with perf.stage('random network layout') as stage:
+        pos = layouts.layout(g2, k=0.2)
+        stage['rows'] = g2.number_of_nodes()
 
     # Compute edge widths based on 'count' attribute
     edge_widths = [d['count'] for (_, _, d) in g2.edges(data=True)]
     max_edge = max(edge_widths)
     edge_widths_normalized = np.power(edge_widths, 0.5) / np.power(max_edge, 0.5) * 4
 
-    nx.draw_networkx_nodes(g2, pos, node_size=25, node_color='red', alpha=0.3)
-    nx.draw_networkx_edges(g2, pos, edge_color='black', alpha=0.3, width=edge_widths_normalized)
-    nx.draw_networkx_labels(g2, pos, font_size=10, font_color='black')
+    with perf.stage('random network drawing'):
+        nx.draw_networkx_nodes(g2, pos, node_size=25, node_color='red', alpha=0.3)
+        nx.draw_networkx_edges(g2, pos, edge_color='black', alpha=0.3, width=edge_widths_normalized)
+        nx.draw_networkx_labels(g2, pos, font_size=10, font_color='black')
 
-    plt.title("Connections between a random subset of workers", fontsize=20, fontweight='bold')
-    st.pyplot(plt)
+        plt.title("Connections between a random subset of workers", fontsize=20, fontweight='bold')
+        st.pyplot(plt)
 
 
-def in_out_degrees(graph_to_plot):
-    in_degree_dict = dict(graph_to_plot.in_degree(weight='count'))
-    out_degree_dict = dict(graph_to_plot.out_degree(weight='count'))
-    # Extract the values from the dictionaries
-    in_degree_values = list(in_degree_dict.values())
-    out_degree_values = list(out_degree_dict.values())
+def in_out_degrees():
+    # Weighted degrees of every worker in the full graph, precomputed at ingest
+    in_degree_values = metrics['In-Degree']
+    out_degree_values = metrics['Out-Degree']
 
     # Create the histogram plot
     plt.figure(figsize=(10, 6))
@@ -62,35 +66,40 @@ def in_out_degrees(graph_to_plot):
     plt.ylabel('Frequency')
     plt.title('Distribution of In-degree and Out-degree')
     plt.legend()
-    plt.show()
+    st.pyplot(plt)
 
 
-st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+def central_workers():
+    """
+    Show the most central workers of the whole company graph.
+    """
 
-@st.cache_data
-def get_data():
-    return pd.read_csv('modified_emails.csv')
+    top_df = metrics.sort_values('PageRank', ascending=False).head(15)
+    st.subheader("Most Central Workers")
+    st.dataframe(top_df[['PageRank', 'Closeness', 'In-Degree', 'Out-Degree']], use_container_width=True)
 
 
-df = get_data()
-st.title(":bar_chart: Graph Data")
-st.markdown("##")
+st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+perf = profiling.start_page("connections")
+generation = data_access.get_generation()
 
+with perf.stage('load graph'):
+    data_access.require('graph', 'metrics', generation=generation)
+    store = data_access.get_graph(generation)
+    metrics = data_access.get_metrics(generation)
+    layouts = data_access.get_layout_cache()
 
-def prepare_graph():
-    df['To'] = df['To'].apply(ast.literal_eval)
-    sub_df = df.loc[df['To'].map(len) == 1, ['From', 'To', 'Content']].fillna(0).copy()
-    sub_df['To'] = sub_df['To'].map(lambda x: x[0])
-    sub_df = sub_df.groupby(['From', 'To']).count().reset_index()
-    sub_df.rename(columns={'Content': 'count'}, inplace=True)
-    return sub_df.sort_values('count', ascending=False).reset_index()
+st.sidebar.header("Filter Here:")
+random_percent = st.sidebar.slider("Random Subset Size (% of connections):", min_value=1, max_value=20, value=1)
+st.title(":bar_chart: Graph Data")
+st.markdown("##")
 
 
-sub_df_for_graph = prepare_graph()
-graph = nx.from_pandas_edgelist(sub_df_for_graph.head(100), source='From', target='To',
-                                edge_attr='count')
-graph2 = nx.from_pandas_edgelist(sub_df_for_graph.head(100), source='From', target='To',
-                                edge_attr='count', create_using=nx.DiGraph)
+with perf.stage('edge list') as stage:
+    sub_df_for_graph = store.edge_list()
+    graph = graph_store.to_networkx(store.top_edges(100))
+    graph2 = graph_store.to_networkx(store.top_edges(100), directed=True)
+    stage['rows'] = len(sub_df_for_graph)
 
 # Showing Some KPI's
 total_nodes = graph.number_of_nodes()
@@ -116,5 +125,9 @@ st.markdown("---")
 
 # Plotting
 network_plot(graph2)
-random_network_plot()
-in_out_degrees(graph2)
+random_network_plot(random_percent / 100)
+with perf.stage('degree histogram'):
+    in_out_degrees()
+central_workers()
+
+perf.show()
@@ -1,51 +1,123 @@
 import numpy as np
-import pandas as pd
 import streamlit as st
 from matplotlib import pyplot as plt
 import seaborn as sns
 
+from enron import data_access, profiling
+
+
+def reply_ratio_plot():
+    """
+    Bar chart of the senders with the highest email to reply ratio.
+    """
+
+    ratio_df = grouped_df.copy()
+    # Calculate the difference between number of emails sent and number of replies
+    ratio_df['Email_Reply_Ratio'] = np.where(ratio_df['Reply_Count'] == 0, ratio_df['Emails_Sent'],
+                                             ratio_df['Emails_Sent'] / ratio_df['Reply_Count'])
+    # Sort the DataFrame by the difference in descending order
+    ratio_df = ratio_df.sort_values('Email_Reply_Ratio', ascending=False)
+    # Create a bar plot of the difference between emails sent and replies
+    fig, ax = plt.subplots(figsize=(10, 9))
+    sns.barplot(data=ratio_df.head(30), x='From', y='Email_Reply_Ratio', palette=sns.color_palette("magma", 30),
+                ax=ax)
+    ax.set_xlabel('Sender', fontweight='bold', fontsize=18)
+    ax.set_ylabel('Email/Reply Ratio', fontweight='bold', fontsize=18)
+    ax.set_title('Possible Spammers: Email to Reply Ratio (Top 30)', fontsize=18)
+    ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
+    plt.tight_layout()
+    return fig
+
+
+def sent_vs_words_plot():
+    """
+    Scatter plot of the number of emails sent against the average word count of the top 30 senders.
+    """
+
+    # Sort the DataFrame by number of emails sent in descending order
+    sent_df = grouped_df.sort_values('Emails_Sent', ascending=False)
+    # Scatter plot of number of emails sent vs word count
+    fig = plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=sent_df.head(30), x='Emails_Sent', y='Average_Word_Count', hue='From', palette='Paired')
+    plt.xlabel('Number of Emails Sent')
+    plt.ylabel('Average Word Count')
+    plt.title('Number of Emails Sent vs Word Count (Top 30 Senders)', fontsize=18)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)  # Place legend outside the plot
+    return fig
+
+
+def replies_vs_words_plot():
+    """
+    Scatter plot of the number of replies against the average word count of the top 30 repliers.
+    """
+
+    # Sort the DataFrame by number of replies in descending order
+    reply_df = grouped_df.sort_values('Reply_Count', ascending=False)
+    # Scatter plot of number of replies vs word count
+    fig = plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=reply_df.head(30), x='Reply_Count', y='Average_Word_Count', hue='From', palette='Paired')
+    plt.xlabel('Number of Replies')
+    plt.ylabel('Word Count')
+    plt.title('Number of Replies vs Word Count (Top 30 Repliers)', fontsize=18)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)  # Place legend outside the plot
+    plt.tight_layout()
+    return fig
+
+
+def reply_latency_plot():
+    """
+    Bar chart of the median time the 30 most active repliers take to answer a message.
+    """
+
+    latency_df = thread_senders_df.nlargest(30, 'Replies_Sent')
+    latency_df['Median_Latency_Hours'] = latency_df['Median_Latency_Seconds'] / 3600
+    fig, ax = plt.subplots(figsize=(10, 9))
+    sns.barplot(data=latency_df, x='From', y='Median_Latency_Hours', palette=sns.color_palette("rocket", 30), ax=ax)
+    ax.set_xlabel('Replier', fontweight='bold', fontsize=18)
+    ax.set_ylabel('Median Reply Time (Hours)', fontweight='bold', fontsize=18)
+    ax.set_title('Reply Latency (Top 30 Repliers)', fontsize=18)
+    ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
+    plt.tight_layout()
+    return fig
+
+
+def thread_depth_plot():
+    """
+    Bar chart of the number of conversations by the length of their longest reply chain.
+    """
+
+    # Chains of 10 replies and more share the last bar
+    depths = threads_df['Depth'].clip(upper=10).value_counts().sort_index()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x=[str(depth) if depth < 10 else '10+' for depth in depths.index], y=depths.values,
+                palette=sns.color_palette("mako", len(depths)), ax=ax)
+    ax.set_yscale('log')
+    ax.set_xlabel('Replies In The Longest Chain', fontweight='bold', fontsize=14)
+    ax.set_ylabel('Number of Conversations', fontweight='bold', fontsize=14)
+    ax.set_title('Conversation Depth', fontsize=18)
+    plt.tight_layout()
+    return fig
+
+
 st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+perf = profiling.start_page("more_plots")
+generation = data_access.get_generation()
 
 # Read An already grouped data set based on Reply count emails sent amount and average word count
-grouped_df = pd.read_csv('grouped_emails.csv')
+with perf.stage('load sender summary') as stage:
+    data_access.require('sender summary', 'thread senders', 'threads', generation=generation)
+    grouped_df = data_access.get_sender_summary(generation)
+    thread_senders_df = data_access.get_thread_senders(generation)
+    threads_df = data_access.get_threads(generation)
+    figures = data_access.get_figure_cache()
+    data_version = data_access.get_data_version(generation)
+    stage['rows'] = len(grouped_df)
 st.title(":bar_chart: Additional Summarizing Plots")
 st.markdown("##")
 
-# Calculate the difference between number of emails sent and number of replies
-grouped_df['Email_Reply_Ratio'] = np.where(grouped_df['Reply_Count'] == 0, grouped_df['Emails_Sent'],
-                                           grouped_df['Emails_Sent'] / grouped_df['Reply_Count'])
-# Sort the DataFrame by the difference in descending order
-grouped_df = grouped_df.sort_values('Email_Reply_Ratio', ascending=False)
-# Create a bar plot of the difference between emails sent and replies
-fig, ax = plt.subplots(figsize=(10, 9))
-sns.barplot(data=grouped_df.head(30), x='From', y='Email_Reply_Ratio', palette=sns.color_palette("magma", 30),
-            ax=ax)
-ax.set_xlabel('Sender', fontweight='bold', fontsize=18)
-ax.set_ylabel('Email/Reply Ratio', fontweight='bold', fontsize=18)
-ax.set_title('Possible Spammers: Email to Reply Ratio (Top 30)', fontsize=18)
-ax.set_xticklabels(ax.get_xticklabels(), rotation=90, fontweight='bold', fontsize=12)
-plt.tight_layout()
-st.pyplot(plt)
-
-# Sort the DataFrame by number of emails sent in descending order
-grouped_df = grouped_df.sort_values('Emails_Sent', ascending=False)
-# Scatter plot of number of emails sent vs word count
-plt.figure(figsize=(10, 6))
-sns.scatterplot(data=grouped_df.head(30), x='Emails_Sent', y='Average_Word_Count', hue='From', palette='Paired')
-plt.xlabel('Number of Emails Sent')
-plt.ylabel('Average Word Count')
-plt.title('Number of Emails Sent vs Word Count (Top 30 Senders)', fontsize=18)
-plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)  # Place legend outside the plot
-st.pyplot(plt)
-
-# Sort the DataFrame by number of replies in descending order
-grouped_df = grouped_df.sort_values('Reply_Count', ascending=False)
-# Scatter plot of number of replies vs word count
-plt.figure(figsize=(10, 6))
-sns.scatterplot(data=grouped_df.head(30), x='Reply_Count', y='Average_Word_Count', hue='From', palette='Paired')
-plt.xlabel('Number of Replies')
-plt.ylabel('Word Count')
-plt.title('Number of Replies vs Word Count (Top 30 Repliers)', fontsize=18)
-plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)  # Place legend outside the plot
-plt.tight_layout()
-st.pyplot(plt)
+# The page has no filters, every chart is rendered once per data version
+for draw in (reply_ratio_plot, sent_vs_words_plot, replies_vs_words_plot, reply_latency_plot, thread_depth_plot):
+    with perf.stage(f'chart {draw.__name__}'):
+        st.image(figures.render(draw.__name__, (), data_version, draw), use_column_width=True)
+
+perf.show()
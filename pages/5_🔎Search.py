@@ -0,0 +1,118 @@
+import time
+
+import streamlit as st
+
+from enron import cube, data_access, profiling
+
+
+def show_results(results_df):
+    """
+    Show the newest matching emails as a table.
+    """
+
+    results_df = results_df.sort_values('Date', ascending=False).head(100)
+    results_df['From'] = results_df['From'].astype(str)
+    st.subheader("Newest Matching Emails")
+    st.dataframe(results_df[['Date', 'From', 'Subject']], use_container_width=True, hide_index=True)
+
+
+st.set_page_config(page_title="Enron Emails Dashboard", page_icon="💌", layout='wide')
+perf = profiling.start_page("search")
+generation = data_access.get_generation()
+
+# The sidebar options come from the count cube, the messages are only loaded for the selected year and month
+with perf.stage('load cube'):
+    data_access.require('cube', generation=generation)
+    cube_df = data_access.get_cube(generation)
+
+# Adding Some filters on the sidebar for the data
+st.sidebar.header("Filter Here:")
+reply_options = ["All", True, False]
+is_reply = st.sidebar.selectbox("Reply Email:", reply_options)
+
+forward_options = ["All", True, False]
+is_forward = st.sidebar.selectbox("Forward Email:", forward_options)
+
+month_dict = {"January": 1, "February": 2, "March": 3, "April": 4, "May": 5, "June": 6, "July": 7, "August": 8,
+              "September": 9, "October": 10, "November": 11, "December": 12
+              }
+
+day_dict = {"Sunday": 1, "Monday": 2, "Tuesday": 3, "Wednesday": 4, "Thursday": 5, "Friday": 6, "Saturday": 7}
+
+years = [int(year) for year in cube.counts_by(cube_df, "Year")["Year"]]
+
+months = cube.counts_by(cube_df, "Month")["Month"]
+months_sorted = sorted(months, key=lambda x: month_dict.get(x))
+
+days = cube.counts_by(cube_df, "Day")["Day"]
+days_sorted = sorted(days, key=lambda x: day_dict.get(x))
+
+selected_year = st.sidebar.selectbox("Select Year:", ["All"] + years)
+selected_month = st.sidebar.selectbox("Select Month:", ["All"] + list(months_sorted))
+selected_day = st.sidebar.selectbox("Select Day:", ["All"] + list(days_sorted))
+
+senders = cube.counts_by(cube_df, 'From').nlargest(10, 'count')['From'].tolist()
+selected_sender = st.sidebar.selectbox("Select Sender Mail:", ["All"] + senders)
+
+st.title(":mag: Search Emails")
+st.markdown("##")
+
+query = st.text_input("Search Query:", placeholder='"gas prices" california -subject:fw OR forward:enron')
+st.caption('Words must all match, "quotes" match a phrase, a leading - or NOT excludes, OR separates alternatives, '
+           'and subject:, content: or forward: limit a word to one field.')
+
+if query.strip():
+    # The search box is usable while the index is still loading, the search waits for it
+    data_access.require('search index', 'dataset', generation=generation)
+    with perf.stage('search') as stage:
+        index = data_access.get_search_index(generation)
+        start = time.perf_counter()
+        message_ids = index.search(query)
+        search_ms = (time.perf_counter() - start) * 1000
+        stage['rows'] = len(message_ids)
+
+    with perf.stage('load emails') as stage:
+        filter_df = data_access.get_emails(['Message-ID', 'Date', 'From', 'Subject', 'Year', 'Month', 'Day',
+                                            'Is-Reply', 'Is-Forwarded'],
+                                           years=None if selected_year == "All" else [selected_year],
+                                           months=None if selected_month == "All" else [selected_month],
+                                           generation=generation)
+        stage['rows'] = len(filter_df)
+
+    with perf.stage('filter masks') as stage:
+        filter_df = filter_df[filter_df['Message-ID'].isin(message_ids)]
+
+        if selected_day != "All":
+            filter_df = filter_df[filter_df["Day"] == selected_day]
+
+        if is_reply != "All":
+            filter_df = filter_df[filter_df["Is-Reply"] == is_reply]
+
+        if is_forward != "All":
+            filter_df = filter_df[filter_df["Is-Forwarded"] == is_forward]
+
+        if selected_sender != "All":
+            filter_df = filter_df[filter_df["From"] == selected_sender]
+        stage['rows'] = len(filter_df)
+
+    # Adding Some KPI's
+    total_emails = filter_df.shape[0]
+    if total_emails != 0:
+        l_col, m_col, r_col = st.columns(3)
+        # Will have 3 KPIs - Matching Emails, Distinct Senders, Search Time
+        with l_col:
+            st.subheader("Matching Emails: ")
+            st.subheader(total_emails)
+        with m_col:
+            st.subheader("Total Distinct Senders: ")
+            st.subheader(filter_df['From'].nunique())
+        with r_col:
+            st.subheader("Search Time: ")
+            st.subheader(f"{search_ms:.1f} ms")
+
+        st.markdown("---")
+        show_results(filter_df)
+    else:
+        st.warning("No Emails Match The Search And Filters")
+
+perf.show()
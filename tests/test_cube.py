@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from enron import cube, ingest, synthetic
+
+
+@pytest.fixture(scope='module')
+def emails():
+    return ingest.parse_chunk(synthetic.generate(2000))
+
+
+def expected_counts(emails, filters, column):
+    counts = cube.apply_filters(emails, filters).groupby(column, observed=True).size()
+    counts = counts[counts > 0].rename('count').reset_index()
+    counts[column] = counts[column].astype(str) if column in ('Month', 'Day') else counts[column]
+    return counts.sort_values(column, ignore_index=True)
+
+
+def filter_cases(emails):
+    top_sender = emails['From'].value_counts().index[0]
+    return [
+        {},
+        {'Year': 2001},
+        {'Month': 'May', 'Is-Reply': True},
+        {'From': top_sender, 'Day': 'Monday'},
+        {'Year': 2000, 'Month': 'December', 'Day': 'Friday', 'Is-Forwarded': False},
+        {'Year': 1990},
+    ]
+
+
+@pytest.mark.parametrize('column', ['From', 'Year', 'Month', 'Day', 'Hour'])
+def test_cube_counts_match_a_groupby_of_the_emails(emails, column):
+    email_cube = cube.build_cube(emails)
+    for filters in filter_cases(emails):
+        actual = cube.counts_by(cube.apply_filters(email_cube, filters), column)
+        expected = expected_counts(emails, filters, column)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_merged_chunk_cubes_match_the_cube_of_all_emails(emails):
+    chunks = [cube.build_cube(emails.iloc[i:i + 700]) for i in range(0, len(emails), 700)]
+    merged = cube.merge_cubes(*chunks)
+    assert merged['count'].sum() == len(emails)
+    for column in ('From', 'Month', 'Hour'):
+        pd.testing.assert_frame_equal(cube.counts_by(merged, column), expected_counts(emails, {}, column),
+                                      check_dtype=False)
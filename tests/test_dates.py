@@ -0,0 +1,49 @@
+import re
+
+import pandas as pd
+import pytest
+
+from enron import dates, synthetic
+
+HEADERS = [
+    'Mon, 14 May 2001 16:39:00 -0700 (PDT)',
+    'Fri, 29 Dec 0000 23:05:00 -0800 (PST)',
+    'Tue, 1 Jan 0002 00:30:00 +0000 (GMT)',
+    'Wed, 31 Jan 2001 23:59:59 -0500 (CDT)',
+    'Sun, 1 Oct 2000 01:15:00 +0530 (IST)',
+]
+
+
+def synthetic_headers(n_messages):
+    messages = synthetic.generate(n_messages)['message']
+    return messages.str.extract(r'^Date: (.*)$', flags=re.MULTILINE, expand=False)
+
+
+def test_parse_dates_matches_the_legacy_parser():
+    expected = [dates.parse_custom_date(header) for header in HEADERS]
+    assert list(dates.parse_dates(HEADERS)) == expected
+
+
+def test_parse_dates_matches_the_legacy_parser_on_synthetic_headers():
+    # The synthetic headers include the zero padded years the ingest fixes up
+    report = dates.validate(synthetic_headers(2000), sample=2000)
+    assert report['checked'] == 2000
+    assert report['mismatches'] == 0
+
+
+def test_unparsable_headers_become_nat():
+    parsed = dates.parse_dates(['not a date', HEADERS[0]])
+    assert pd.isna(parsed[0])
+    assert parsed[1] == dates.parse_custom_date(HEADERS[0])
+    with pytest.raises(ValueError):
+        dates.parse_dates(['not a date'], errors='raise')
+
+
+def test_date_parts_match_pandas():
+    parsed = dates.parse_dates(synthetic_headers(500))
+    parts = dates.date_parts(parsed)
+    assert (parts['Year'] == parsed.dt.year).all()
+    assert (parts['Month'].astype(str) == parsed.dt.month_name()).all()
+    assert (parts['Day'].astype(str) == parsed.dt.day_name()).all()
+    assert (parts['Hour'] == parsed.dt.hour).all()
+    assert list(parts['Month'].cat.categories) == dates.MONTHS
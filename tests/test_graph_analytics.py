@@ -0,0 +1,63 @@
+import networkx as nx
+import numpy as np
+import pytest
+from scipy import sparse
+
+from enron import graph_analytics
+
+
+@pytest.fixture(scope='module')
+def graph():
+    # Random weighted edges between nodes 0-59, a separate component (60-63 and 70), a dangling node (4) and
+    # isolated nodes
+    rng = np.random.default_rng(0)
+    n = 80
+    sources = rng.integers(0, 60, size=300)
+    targets = rng.integers(0, 60, size=300)
+    sources = np.r_[sources, 60, 61, 62, 63, 3]
+    targets = np.r_[targets, 61, 62, 60, 70, 4]
+    keep = (sources != targets) & (sources != 4)
+    sources, targets = sources[keep], targets[keep]
+    weights = sparse.csr_matrix((rng.integers(1, 6, size=len(sources)), (sources, targets)), shape=(n, n))
+    weights.sum_duplicates()
+    g = nx.DiGraph()
+    g.add_nodes_from(range(n))
+    rows, cols = weights.nonzero()
+    g.add_weighted_edges_from((i, j, weights[i, j]) for i, j in zip(rows, cols))
+    return weights, g
+
+
+def as_array(values, n):
+    return np.array([values[node] for node in range(n)])
+
+
+def test_closeness_matches_networkx(graph):
+    weights, g = graph
+    expected = as_array(nx.closeness_centrality(g), g.number_of_nodes())
+    np.testing.assert_allclose(graph_analytics.closeness(weights, workers=1), expected)
+
+
+def test_approximate_closeness_is_exact_with_every_node_as_pivot(graph):
+    weights, g = graph
+    np.testing.assert_allclose(graph_analytics.approximate_closeness(weights, samples=weights.shape[0]),
+                               graph_analytics.closeness(weights, workers=1))
+
+
+def test_pagerank_matches_networkx(graph):
+    weights, g = graph
+    expected = as_array(nx.pagerank(g, weight='weight', tol=1.0e-10), g.number_of_nodes())
+    actual = graph_analytics.pagerank(weights, tol=1.0e-10)
+    np.testing.assert_allclose(actual, expected, atol=1.0e-8)
+    assert actual.sum() == pytest.approx(1)
+
+
+def test_degrees_and_components_match_networkx(graph):
+    weights, g = graph
+    n = g.number_of_nodes()
+    in_degree, out_degree = graph_analytics.degrees(weights)
+    np.testing.assert_array_equal(in_degree, as_array(dict(g.in_degree(weight='weight')), n))
+    np.testing.assert_array_equal(out_degree, as_array(dict(g.out_degree(weight='weight')), n))
+    weak, strong = graph_analytics.components(weights)
+    for labels, expected in ((weak, nx.weakly_connected_components(g)), (strong, nx.strongly_connected_components(g))):
+        actual = sorted(sorted(np.flatnonzero(labels == label)) for label in np.unique(labels))
+        assert actual == sorted(sorted(component) for component in expected)
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from enron import ingest, storage, synthetic
+
+nltk = pytest.importorskip('nltk')
+
+
+def has_corpora(*names):
+    try:
+        for name in names:
+            nltk.data.find(name)
+    except LookupError:
+        return False
+    return True
+
+
+# The word counts use the regex mode, but the term index still lemmatizes with NLTK
+pytestmark = pytest.mark.skipif(not has_corpora('corpora/stopwords', 'corpora/wordnet'),
+                                reason="needs the NLTK stopwords and wordnet corpora")
+
+
+def ingest_dir(source, data_dir, *args):
+    ingest.main([str(source), str(data_dir), '--workers', '1', '--chunksize', '100', '--word-count', 'regex', *args])
+
+
+def read_emails(data_dir, columns):
+    return pd.read_parquet(storage.artifact_path('emails', storage.current_path(str(data_dir))), columns=columns)
+
+
+def test_incremental_ingest_picks_up_messages_outside_the_previous_window(tmp_path):
+    source = synthetic.write_csv(str(tmp_path / 'emails.csv'), 400)
+    data_dir = tmp_path / 'data'
+
+    ingest_dir(source, data_dir, '--start', '2000-01-01', '--end', '2000-07-01')
+    windowed = read_emails(data_dir, ['Message-ID', 'Date'])
+    assert 0 < len(windowed) < 400
+    assert windowed['Date'].between(pd.Timestamp('2000-01-01'), pd.Timestamp('2000-07-01'), inclusive='left').all()
+
+    ingest_dir(source, data_dir, '--incremental')
+    full_dir = tmp_path / 'full'
+    ingest_dir(source, full_dir)
+    incremental = read_emails(data_dir, ['Message-ID'])['Message-ID']
+    full = read_emails(full_dir, ['Message-ID'])['Message-ID']
+    assert incremental.is_unique
+    assert set(incremental) == set(full)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from enron import ingest, search_index, synthetic
+
+
+def docs_frame(contents, subjects=None):
+    return pd.DataFrame({'Message-ID': [f'<{i}>' for i in range(len(contents))], 'Content': contents,
+                         'Subject': subjects or [''] * len(contents), 'Forward-Content': [None] * len(contents)})
+
+
+def brute_force(df, tokens, fields=tuple(search_index.FIELDS.values())):
+    # Messages holding ``tokens`` as consecutive tokens of one of ``fields``
+    n = len(tokens)
+    found = set()
+    for _, row in df.iterrows():
+        for field in fields:
+            text = search_index.tokenize(row[field])
+            if any(text[i:i + n] == tokens for i in range(len(text) - n + 1)):
+                found.add(row['Message-ID'])
+    return found
+
+
+@pytest.fixture(scope='module')
+def emails():
+    return ingest.parse_chunk(synthetic.generate(300))
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 255, 16383, 16384, 2 ** 21 - 1, 2 ** 21, 2 ** 35 + 7, 2 ** 62], dtype=np.uint64)
+    values = np.concatenate([values, np.random.default_rng(0).integers(0, 2 ** 40, size=1000).astype(np.uint64)])
+    data, lengths = search_index.encode_varints(values)
+    assert list(lengths[:7]) == [1, 1, 1, 2, 2, 2, 3]
+    assert len(data) == lengths.sum()
+    assert (search_index.decode_varints(data) == values.astype(np.int64)).all()
+    assert len(search_index.decode_varints(search_index.encode_varints([])[0])) == 0
+
+
+def test_postings_round_trip(emails):
+    builder = search_index.SegmentBuilder()
+    builder.add(emails)
+    segment = builder.build()
+    ids = emails['Message-ID'].to_numpy()
+    for field, column in search_index.FIELDS.items():
+        expected = {}
+        for doc, text in enumerate(emails[column]):
+            for position, token in enumerate(search_index.tokenize(text)):
+                expected.setdefault(token, []).append((doc, position))
+        terms = segment.fields[field][0]
+        assert set(terms) == set(expected)
+        for term in list(expected)[:200]:
+            postings = segment.postings(field, term)
+            assert list(zip(postings.occurrence_docs, postings.positions)) == expected[term]
+            assert list(ids[postings.docs]) == list(dict.fromkeys(ids[doc] for doc, _ in expected[term]))
+
+
+def test_phrase_queries_match_a_scan(emails, tmp_path):
+    index = search_index.SearchIndex(path=str(tmp_path))
+    # Two segments, reloaded from disk
+    index.add(emails.iloc[:150])
+    index.add(emails.iloc[150:])
+    index = search_index.SearchIndex.load(str(tmp_path))
+
+    rng = np.random.default_rng(0)
+    phrases = []
+    for text in emails['Content'].sample(20, random_state=0):
+        tokens = search_index.tokenize(text)
+        start = int(rng.integers(0, max(len(tokens) - 3, 1)))
+        if len(tokens[start:start + 3]) > 1:
+            phrases.append(tokens[start:start + 3])
+    phrases += [['gas', 'prices'], ['the', 'the'], ['forwarded', 'by'], ['no', 'such', 'phrase']]
+    for tokens in phrases:
+        found = set(index.search('"' + ' '.join(tokens) + '"'))
+        assert found == brute_force(emails, tokens)
+    assert set(index.search('subject:"gas prices"')) == brute_force(emails, ['gas', 'prices'], ['Subject'])
+
+
+def test_query_operators():
+    df = docs_frame(['gas prices rise in california', 'prices of gas', 'power prices', 'california gas'],
+                    ['fw: gas', 'meeting', 'gas prices', ''])
+    builder = search_index.SegmentBuilder()
+    builder.add(df)
+    index = search_index.SearchIndex([builder.build()])
+
+    def search(query):
+        return sorted(index.search(query))
+
+    assert search('"gas prices"') == ['<0>', '<2>']
+    assert search('content:"gas prices"') == ['<0>']
+    assert search('gas prices') == ['<0>', '<1>', '<2>']
+    assert search('gas -california') == ['<1>', '<2>']
+    assert search('gas NOT subject:fw') == ['<1>', '<2>', '<3>']
+    assert search('power OR "california gas"') == ['<2>', '<3>']
+    assert search('-prices') == ['<3>']
+
+
+def test_deleted_messages_are_not_found(tmp_path):
+    index = search_index.SearchIndex(path=str(tmp_path))
+    index.add(docs_frame(['gas prices', 'gas', 'power']))
+    assert index.delete(['<0>', '<9>']) == 1
+    assert sorted(index.search('gas')) == ['<1>']
+    assert sorted(search_index.SearchIndex.load(str(tmp_path)).search('gas')) == ['<1>']
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from enron import ingest, synthetic, threads
+
+START = pd.Timestamp('2001-05-01 09:00')
+
+
+def messages(rows):
+    # (sender, recipients, subject, hours after START or None)
+    return pd.DataFrame({
+        'Message-ID': [f'<{i}>' for i in range(len(rows))],
+        'From': [row[0] for row in rows],
+        'To': [row[1] for row in rows],
+        'Subject': [row[2] for row in rows],
+        'Date': [START + pd.Timedelta(hours=row[3]) if row[3] is not None else pd.NaT for row in rows],
+    })
+
+
+def test_normalize_subjects():
+    subjects = pd.Series(['RE: Fw: re[2]:  Gas   Prices ', 'FWD:gas prices', 'Re: Re:', None, 'Prices: gas'])
+    assert list(threads.normalize_subjects(subjects)) == ['gas prices', 'gas prices', '', '', 'prices: gas']
+
+
+def test_assign_threads():
+    df = messages([
+        ('a', ['b'], 'Meeting', 0),
+        ('b', ['a', 'c'], 'Re: Meeting', 1),
+        ('c', ['a'], 'RE: meeting', 3),
+        # d was never written to in this conversation, so it starts one of its own
+        ('d', ['a'], 'Re: Meeting', 4),
+        # A month of silence starts a new conversation
+        ('b', ['a'], 'Re: Meeting', 24 * 30),
+        # e writing twice is one conversation without replies
+        ('e', ['f'], 'Budget', 0),
+        ('e', ['f'], 'Re: Budget', 1),
+        # Empty subjects and undated messages are never threaded
+        ('a', ['b'], '', 6),
+        ('b', ['a'], '', 7),
+        ('a', ['b'], 'Meeting', None),
+    ])
+    result = threads.assign_threads(df).set_index('Message-ID')
+    groups = result.groupby('Thread-ID').groups
+    assert sorted(sorted(ids) for ids in groups.values()) == sorted(
+        [['<0>', '<1>', '<2>'], ['<3>'], ['<4>'], ['<5>', '<6>'], ['<7>'], ['<8>'], ['<9>']])
+
+    parents = result['Parent-ID']
+    assert parents['<1>'] == '<0>'
+    assert parents['<2>'] == '<1>'
+    assert parents.drop(['<1>', '<2>']).isna().all()
+    assert list(result.loc[['<0>', '<1>', '<2>'], 'Depth']) == [0, 1, 2]
+    assert list(result.loc[['<1>', '<2>'], 'Latency_Seconds']) == [3600, 7200]
+    assert list(result.loc[['<1>', '<2>'], 'Replied-To']) == ['a', 'b']
+
+
+def test_replies_answer_an_earlier_message_sent_to_the_replier():
+    df = ingest.parse_chunk(synthetic.generate(3000))
+    result = threads.assign_threads(df)
+    assert list(result['Message-ID']) == list(df['Message-ID'])
+    positions = pd.Series(np.arange(len(df)), index=df['Message-ID'])
+    replies = result.dropna(subset=['Parent-ID'])
+    assert len(replies)
+    parents = result.iloc[positions[replies['Parent-ID']].to_numpy()]
+    assert (parents['Thread-ID'].to_numpy() == replies['Thread-ID'].to_numpy()).all()
+    assert (parents['Subject'].to_numpy() == replies['Subject'].to_numpy()).all()
+    assert (parents['Date'].to_numpy() <= replies['Date'].to_numpy()).all()
+    assert (parents['From'].to_numpy() != replies['From'].to_numpy()).all()
+    assert (replies['Depth'].to_numpy() == parents['Depth'].to_numpy() + 1).all()
+    recipients = df['To'].to_numpy()[positions[replies['Parent-ID']].to_numpy()]
+    assert all(sender in to for sender, to in zip(replies['From'], recipients))
+
+
+def test_thread_tables_add_up():
+    df = ingest.parse_chunk(synthetic.generate(1000))
+    tables = threads.compute_threads(df)
+    n_replies = tables['messages']['Parent-ID'].notna().sum()
+    assert tables['threads']['Messages'].sum() == len(df)
+    assert tables['threads']['Replies'].sum() == n_replies
+    assert tables['senders']['Emails_Sent'].sum() == len(df)
+    assert tables['senders']['Replies_Sent'].sum() == tables['senders']['Replies_Received'].sum() == n_replies
+    assert tables['edges']['count'].sum() == n_replies